@@ -2,7 +2,7 @@ from flask import Flask, request, jsonify
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from thefuzz import process
+from medicine_index import NameIndex
 from flask_cors import CORS
 import pytesseract
 from PIL import Image
@@ -22,14 +22,13 @@ df["full_composition"] = df["short_composition1"].str.lower() + " " + df["short_
 tfidf = TfidfVectorizer(stop_words="english", max_features=5000)
 tfidf_matrix = tfidf.fit_transform(df["full_composition"])
 
+# Trigram index so lookups don't scan every name
+name_index = NameIndex(df["name"])
+
 # Function to Match Closest Medicine
 def find_best_match(partial_name):
-    result = process.extractOne(partial_name, df["name"])
-    if result:
-        best_match = result[0]  # Extract medicine name
-        score = result[1]       # Extract similarity score
-        return best_match if score > 70 else None
-    return None
+    result = name_index.match(partial_name, score_cutoff=70)
+    return result[0] if result else None
 
 # Function to Recommend Alternatives
 def recommend_medicine(partial_name, top_n=5):
@@ -37,7 +36,7 @@ def recommend_medicine(partial_name, top_n=5):
     if not best_match:
         return None, f"No close match found for '{partial_name}'."
 
-    idx = df[df["name"] == best_match].index[0]
+    idx = name_index.position(best_match)
     sim_scores = cosine_similarity(tfidf_matrix[idx], tfidf_matrix).flatten()
     similar_indices = sim_scores.argsort()[-top_n-1:-1][::-1]
     recommendations = df.iloc[similar_indices][["name", "manufacturer_name", "price(₹)"]].to_dict(orient="records")
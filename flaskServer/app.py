@@ -5,29 +5,49 @@ import sys
 if os.name == 'nt':
     sys.stdout.reconfigure(encoding='utf-8')
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import requests
 import json
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from thefuzz import process
+from medicine_index import NameIndex
+from medicine_cache import (NeighborTable, dataset_version, load_medicine_artifacts, prune_medicine_caches,
+                            read_medicine_catalog, save_medicine_artifacts, top_positions, version_dir)
 import speech_recognition as sr
-import pyttsx3
 from dotenv import load_dotenv
-import pytesseract
-from PIL import Image
-import io
+import gc
+import re
+import threading
+import time
+from memory_stats import format_memory
+from gemini_client import GeminiClient
+from response_cache import create_response_cache
+from semantic_cache import create_semantic_cache
+from disease_advice import NO_ADVICE, disease_key, load_disease_advice
+from disease_matcher import build_disease_matcher
+from response_templates import TemplateRegistry
+from tts_service import create_tts_service
+from ocr_engine import OCRBusy, create_ocr_engine
+from ocr_preprocess import create_ocr_preprocessor
+from ocr_cache import create_ocr_result_cache
+from health_probes import create_health_probes
+from hospital_cache import EARTH_RADIUS_KM, create_hospital_cache, haversine_km_array
+from hospital_index import HospitalIndex, element_location
+from hospital_search import HospitalNameIndex
 
 app = Flask(__name__)
-# Configure CORS to allow credentials and specific origins
+# Configure CORS to allow credentials and specific origins (shared with the async routes in asgi.py)
+CORS_ORIGINS = ['http://localhost:5173', 'https://telemedicine-sih-frontend.vercel.app']
+CORS_HEADERS = ['Content-Type', 'Authorization', 'Accept']
+CORS_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
 CORS(app, 
-     origins=['http://localhost:5173', 'https://telemedicine-sih-frontend.vercel.app'],
+     origins=CORS_ORIGINS,
      supports_credentials=True,
-     allow_headers=['Content-Type', 'Authorization', 'Accept'],
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+     allow_headers=CORS_HEADERS,
+     methods=CORS_METHODS)
 
 # Load environment variables from backend .env file (if it exists)
 backend_env_path = os.path.join(os.path.dirname(__file__), '..', 'backend', '.env')
@@ -37,12 +57,15 @@ if os.path.exists(backend_env_path):
     except UnicodeDecodeError:
         print(f"Warning: Could not load .env file due to encoding issues. Using fallback values.")
 
-# Initialize text-to-speech engine (only if available)
-try:
-    engine = pyttsx3.init()
-except:
-    engine = None
-    print("Text-to-speech engine not available")
+# Text-to-speech is rendered in a process pool, off the request path (see /api/tts)
+tts_service = create_tts_service()
+
+# Long-lived Tesseract workers for medicine-strip images, fallback configurations in parallel
+ocr_engine = create_ocr_engine()
+# Uploads are shrunk to a fixed pixel budget, binarized, deskewed and cropped before OCR
+ocr_preprocessor = create_ocr_preprocessor()
+# Results per uploaded photo, so retries and re-uploads skip OCR entirely
+ocr_result_cache = create_ocr_result_cache()
 
 # =============================================================================
 # CHATBOT MODULE
@@ -58,102 +81,69 @@ if not GEMINI_API_KEY:
     print("Warning: GEMINI_API_KEY not found in environment variables and no fallback available.")
     GEMINI_API_KEY = ""
 
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+# One pooled keep-alive client shared by all requests in this process
+gemini_client = GeminiClient(GEMINI_API_KEY)
 
-# Function to get a response from Gemini API
-def gemini_response(prompt, language='en', response_language='en'):
-    # Language-specific prompts for Indian languages
-    language_prompts = {
-        'hi': {
-            'system': 'आप एक पेशेवर मेडिकल AI सहायक हैं। कृपया हिंदी में एक अच्छी तरह से संरचित, पेशेवर उत्तर प्रदान करें।',
-            'instructions': '''कृपया अपना उत्तर इस तरह से प्रारूपित करें:
-- स्पष्ट चिकित्सा जानकारी
-- पेशेवर शब्दावली
-- सूची के लिए बुलेट पॉइंट्स
-- स्वास्थ्य पेशेवरों से परामर्श लेने की अस्वीकरण शामिल करें
-- उत्तर संक्षिप्त और जानकारीपूर्ण रखें
-- केवल हिंदी में उत्तर दें
-
-पेशेवर चिकित्सा परामर्श की आवश्यकता पर जोर देते हुए व्यावहारिक चिकित्सा मार्गदर्शन प्रदान करें।'''
-        },
-        'ta': {
-            'system': 'நீங்கள் ஒரு தொழில்முறை மருத்துவ AI உதவியாளர். தயவுசெய்து தமிழில் நல்ல முறையில் கட்டமைக்கப்பட்ட, தொழில்முறை பதிலை வழங்கவும்.',
-            'instructions': '''தயவுசெய்து உங்கள் பதிலை இப்படி வடிவமைக்கவும்:
-- தெளிவான மருத்துவ தகவல்கள்
-- தொழில்முறை சொற்கள்
-- பட்டியலுக்கு புள்ளிகள்
-- சுகாதார நிபுணர்களிடம் ஆலோசனை பெறுவது பற்றிய மறுப்பு அறிக்கை
-- பதிலை சுருக்கமாகவும் தகவல் நிறைந்ததாகவும் வைக்கவும்
-- தமிழில் மட்டுமே பதிலளிக்கவும்
-
-தொழில்முறை மருத்துவ ஆலோசனையின் தேவையை வலியுறுத்தும் போது நடைமுறை மருத்துவ வழிகாட்டுதலை வழங்கவும்.'''
-        },
-        'te': {
-            'system': 'మీరు ఒక వృత్తిపరమైన వైద్య AI సహాయకుడు. దయచేసి తెలుగులో బాగా నిర్మాణాత్మకమైన, వృత్తిపరమైన సమాధానం అందించండి.',
-            'instructions': '''దయచేసి మీ సమాధానాన్ని ఈ విధంగా ఫార్మాట్ చేయండి:
-- స్పష్టమైన వైద్య సమాచారం
-- వృత్తిపరమైన పరిభాష
-- జాబితాల కోసం బుల్లెట్ పాయింట్లు
-- ఆరోగ్య నిపుణులను సంప్రదించడం గురించి నిరాకరణ చేర్చండి
-- సమాధానాన్ని సంక్షిప్తంగా మరియు సమాచారంతో ఉంచండి
-- తెలుగులో మాత్రమే సమాధానం ఇవ్వండి
-
-వృత్తిపరమైన వైద్య సలహా అవసరాన్ని నొక్కిచెప్పేటప్పుడు ఆచరణాత్మక వైద్య మార్గదర్శకత్వం అందించండి.'''
-        },
-        'bn': {
-            'system': 'আপনি একজন পেশাদার চিকিৎসা AI সহায়ক। দয়া করে বাংলায় একটি সুগঠিত, পেশাদার উত্তর প্রদান করুন।',
-            'instructions': '''দয়া করে আপনার উত্তরটি এভাবে ফরম্যাট করুন:
-- স্পষ্ট চিকিৎসা তথ্য
-- পেশাদার পরিভাষা
-- তালিকার জন্য বুলেট পয়েন্ট
-- স্বাস্থ্য পেশাদারদের সাথে পরামর্শ নেওয়ার বিষয়ে দাবিত্যাগ অন্তর্ভুক্ত করুন
-- উত্তর সংক্ষিপ্ত এবং তথ্যপূর্ণ রাখুন
-- শুধুমাত্র বাংলায় উত্তর দিন
-
-পেশাদার চিকিৎসা পরামর্শের প্রয়োজনীয়তার উপর জোর দিয়ে ব্যবহারিক চিকিৎসা নির্দেশনা প্রদান করুন।'''
-        },
-        'en': {
-            'system': 'You are a professional medical AI assistant. Please provide a well-structured, professional response in English.',
-            'instructions': '''Please format your response with:
-- Clear medical information
-- Professional terminology
-- Bullet points for lists
-- Include disclaimer about consulting healthcare professionals
-- Keep response concise and informative
-- Respond ONLY in English
-
-Provide practical medical guidance while emphasizing the need for professional medical consultation.'''
-        }
-    }
+# Repeated questions are answered from cache instead of calling Gemini again:
+# exact (normalized) matches first, then close paraphrases
+chat_cache = create_response_cache()
+semantic_cache = create_semantic_cache()
+
+# Optional JSONL log of chat prompts, replayable with `python benchmark.py semantic --log ...`
+CHAT_PROMPT_LOG = os.getenv('CHAT_PROMPT_LOG')
+_prompt_log_lock = threading.Lock()
+
+# Function to look up a cached answer for a prompt (exact, then semantic)
+def cached_answer(prompt, response_language):
+    if CHAT_PROMPT_LOG:
+        with _prompt_log_lock, open(CHAT_PROMPT_LOG, 'a', encoding='utf-8') as log:
+            log.write(json.dumps({"prompt": prompt, "language": response_language,
+                                  "ts": datetime.now().isoformat()}, ensure_ascii=False) + "\n")
     
+    answer = chat_cache.get(prompt, response_language)
+    if answer is None:
+        answer = semantic_cache.get(prompt, response_language)
+    return answer
+
+# Function to store a fresh answer in both cache layers
+def remember_answer(prompt, response_language, answer):
+    chat_cache.set(prompt, response_language, answer)
+    semantic_cache.set(prompt, response_language, answer)
+
+# Function to wrap the user's question in the language-specific medical prompt
+def build_medical_prompt(prompt, response_language='en'):
     # Get language-specific prompt or default to English
-    lang_config = language_prompts.get(response_language, language_prompts['en'])
-    
-    # Enhanced prompt for better medical formatting with language support
-    enhanced_prompt = f"""{lang_config['system']}
-
-User Question: {prompt}
+    return response_templates.medical_prompt(prompt, response_language)
 
-{lang_config['instructions']}"""
+# Function to get a response from Gemini API
+def gemini_response(prompt, language='en', response_language='en'):
+    cached = cached_answer(prompt, response_language)
+    if cached is not None:
+        return cached
     
-    headers = {"Content-Type": "application/json"}
-    payload = {"contents": [{"parts": [{"text": enhanced_prompt}]}]}
+    enhanced_prompt = build_medical_prompt(prompt, response_language)
     
     try:
-        response = requests.post(GEMINI_API_URL, headers=headers, json=payload, timeout=10)
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            try:
-                ai_response = response_data["candidates"][0]["content"]["parts"][0]["text"]
-                return format_medical_response(ai_response)
-            except KeyError:
-                return "I'm sorry, but I couldn't process your request. Please try again."
-        else:
-            return f"Error: {response.status_code}, {response.text}"
+        response = gemini_client.generate_content(enhanced_prompt)
+        return answer_from_gemini(response, prompt, response_language)
     except Exception as e:
         return f"I'm sorry, there was an error processing your request: {str(e)}"
 
+# Function to turn a generateContent response (requests or httpx) into the chat answer
+def answer_from_gemini(response, prompt, response_language):
+    if response.status_code != 200:
+        return f"Error: {response.status_code}, {response.text}"
+    
+    response_data = response.json()
+    try:
+        ai_response = format_medical_response(response_data["candidates"][0]["content"]["parts"][0]["text"])
+    except KeyError:
+        return "I'm sorry, but I couldn't process your request. Please try again."
+    
+    # Only successful answers are cached, never error messages
+    remember_answer(prompt, response_language, ai_response)
+    return ai_response
+
 def format_medical_response(response):
     """Format and clean the medical response for better readability"""
     import re
@@ -168,40 +158,13 @@ def format_medical_response(response):
     
     return cleaned_response
 
-# Function to simulate streaming response (since Gemini doesn't support streaming)
-def stream_response(text, chunk_size=10):
-    """Simulate streaming by yielding chunks of text"""
-    import time
-    
-    # For Hindi and other non-Latin scripts, preserve words better
-    # Split by sentences first, then by words if needed
-    sentences = text.split('.')
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-            
-        words = sentence.split()
-        for i in range(0, len(words), chunk_size):
-            chunk = " ".join(words[i:i + chunk_size])
-            if i > 0:
-                chunk = " " + chunk
-            
-            # Add sentence ending if this is the last chunk of a sentence
-            if i + chunk_size >= len(words) and sentence != sentences[-1]:
-                chunk += "."
-                
-            yield chunk
-            time.sleep(0.05)  # Small delay to simulate typing
-
 # Recommendation Engine (Do's and Don'ts)
 recommendations = {
     "fever": {
         "do": ["Stay hydrated", "Get plenty of rest", "Take paracetamol if necessary", "Monitor your temperature"],
         "dont": ["Avoid caffeine", "Don't overexert yourself", "Avoid cold drinks", "Don't ignore high fever"]
     },
-    "cold": {
+    "common cold": {
         "do": ["Drink warm fluids", "Rest well", "Use a humidifier", "Take vitamin C"],
         "dont": ["Avoid dairy", "Don't go outside without warm clothes", "Avoid cold beverages", "Don't touch your face often"]
     },
@@ -224,27 +187,105 @@ def book_appointment():
     appointment_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     return f"Your appointment is scheduled for {appointment_time}. Please check your messages for confirmation."
 
+# Guidance is added for at most this many of the diseases mentioned in one answer
+MAX_GUIDANCE_DISEASES = 3
+
+# Function to find the known diseases mentioned in a response, in order of first mention
+def detect_diseases(response):
+    return disease_matcher.find_all(response)[:MAX_GUIDANCE_DISEASES]
+
+# Function to build the heading and care instructions for the detected diseases
+def treatment_guidelines(diseases):
+    if len(diseases) == 1:
+        return response_templates.title(diseases[0]), cached_guidance(diseases[0])
+    title = " & ".join(disease.title() for disease in diseases)
+    return f"**{title} Treatment Guidelines**", "".join(
+        f"**{disease.title()}**\n\n" + cached_guidance(disease) for disease in diseases)
+
+# Function to get the pre-rendered guidance block for a disease (rendered on the fly if unknown)
+def cached_guidance(disease):
+    guidance = response_templates.guidance(disease)
+    return guidance if guidance is not None else disease_guidance(disease)
+
+# Function to build the care instructions block for a detected disease
+def disease_guidance(disease):
+    additional_recs = get_additional_recommendations(disease)
+    
+    # Add structured recommendations (only some diseases have Do's and Don'ts)
+    guidance = ""
+    if disease in recommendations:
+        recommendations_text = get_recommendations(disease)
+        guidance = f"**Immediate Care Instructions:**\n{recommendations_text}\n\n"
+    
+    # Add additional recommendations with proper formatting
+    if additional_recs.get('diet'):
+        diet_items = '\n• '.join(additional_recs.get('diet', []))
+        guidance += f"**📋 Dietary Recommendations:**\n• {diet_items}\n\n"
+    if additional_recs.get('precautions'):
+        precaution_items = '\n• '.join(additional_recs.get('precautions', []))
+        guidance += f"**⚠️ Important Precautions:**\n• {precaution_items}\n\n"
+    if additional_recs.get('workout'):
+        workout_items = '\n• '.join(additional_recs.get('workout', []))
+        guidance += f"**💪 Exercise Guidelines:**\n• {workout_items}\n\n"
+    return guidance
+
+# Function to build the disclaimer and appointment footer in the response language
+def response_footer(response_language, appointment=True):
+    # Automatically book an appointment with better formatting
+    return response_templates.footer(response_language, book_appointment() if appointment else None)
+
+# Function to add disease guidance, disclaimer and (unless appointment=False) appointment details to a model response
+def build_chat_response(response, response_language, appointment=True):
+    diseases = detect_diseases(response)
+    if not diseases:
+        return "".join((response, response_footer(response_language, appointment)))
+    title, guidance = treatment_guidelines(diseases)
+    return "".join((title, "\n\n", response, "\n\n", guidance, response_footer(response_language, appointment)))
+
 # =============================================================================
 # MEDICINE RECOMMENDATION MODULE
 # =============================================================================
 
 # Load Medicine Data
+MEDICINE_CSV_PATH = os.path.join(os.path.dirname(__file__), "A_Z_medicines_dataset_of_India.csv")
 medicine_df = None
 tfidf = None
 tfidf_matrix = None
+name_index = None
+neighbor_table = None
 
 def load_medicine_data():
-    global medicine_df, tfidf, tfidf_matrix
+    global medicine_df, tfidf, tfidf_matrix, name_index, neighbor_table
     try:
-        file_path = os.path.join(os.path.dirname(__file__), "A_Z_medicines_dataset_of_India.csv")
-        medicine_df = pd.read_csv(file_path)
-        
-        medicine_df["short_composition2"] = medicine_df["short_composition2"].fillna("")
-        medicine_df["full_composition"] = medicine_df["short_composition1"].str.lower() + " " + medicine_df["short_composition2"].str.lower()
+        # Reuse the fitted model from a previous start unless the CSV changed
+        version = dataset_version(MEDICINE_CSV_PATH)
+        cache_dir = version_dir(version)
+        cached = load_medicine_artifacts(cache_dir, TfidfVectorizer(stop_words="english", max_features=5000))
+        if cached:
+            medicine_df, tfidf, tfidf_matrix, name_index = cached
+            print(f"Loaded cached medicine artifacts ({version})")
+        else:
+            medicine_df = read_medicine_catalog(MEDICINE_CSV_PATH)
+            
+            # Convert Composition to Vector
+            tfidf = TfidfVectorizer(stop_words="english", max_features=5000)
+            tfidf_matrix = tfidf.fit_transform(medicine_df["full_composition"])
+            
+            # Build the trigram index used for fuzzy name lookups
+            name_index = NameIndex(medicine_df["name"])
+            
+            try:
+                save_medicine_artifacts(cache_dir, medicine_df, tfidf, tfidf_matrix, name_index,
+                                        source=MEDICINE_CSV_PATH)
+                print(f"Saved medicine artifacts to {cache_dir}")
+                prune_medicine_caches(cache_dir, MEDICINE_CSV_PATH)
+            except Exception as e:
+                print(f"Warning: Could not cache medicine artifacts: {e}")
         
-        # Convert Composition to Vector
-        tfidf = TfidfVectorizer(stop_words="english", max_features=5000)
-        tfidf_matrix = tfidf.fit_transform(medicine_df["full_composition"])
+        # Precomputed alternatives (see medicine_cache.py), only if built from this exact CSV
+        neighbor_table = NeighborTable.load(cache_dir, version, len(medicine_df))
+        if neighbor_table is not None:
+            print("Loaded precomputed medicine neighbor table")
         
         print("Medicine data loaded successfully")
         return True
@@ -254,18 +295,75 @@ def load_medicine_data():
 
 # Function to Match Closest Medicine
 def find_best_match(partial_name):
-    if medicine_df is None:
+    if name_index is None:
         return None
     
-    result = process.extractOne(partial_name, medicine_df["name"])
-    if result:
-        best_match = result[0]  # Extract medicine name
-        score = result[1]       # Extract similarity score
-        return best_match if score > 70 else None
-    return None
+    # Only names sharing trigrams with the query are scored; same score > 70 threshold
+    result = name_index.match(partial_name, score_cutoff=70)
+    return result[0] if result else None
+
+# Function to yield candidate rows in descending similarity to row idx
+def ranked_candidates(idx, initial_pool=40):
+    # Precomputed neighbors first, they cover most requests
+    seen = set()
+    if neighbor_table is not None:
+        for candidate in neighbor_table.candidates(idx):
+            seen.add(int(candidate))
+            yield int(candidate)
+
+    # Rows are L2-normalized, so the sparse dot product is the cosine similarity
+    column = (tfidf_matrix @ tfidf_matrix[idx].T).tocsc()
+    column.sort_indices()  # ties then go to the lower row, as in the neighbor table
+    rows, scores = column.indices, column.data
+    pool = initial_pool
+    start = 0
+    while start < len(rows):
+        # Partial selection: only order the best `pool` scores, grow the pool if needed
+        pool = min(pool, len(rows))
+        top = top_positions(scores, pool)
+        for candidate in rows[top[start:]]:
+            if int(candidate) not in seen:
+                seen.add(int(candidate))
+                yield int(candidate)
+        start = pool
+        pool *= 4
+
+# Function to pick alternatives for row idx, one per composition and manufacturer group
+def select_alternatives(idx, top_n=5, sort_by="similarity", diverse=False):
+    query_name = medicine_df["name"].iat[idx]
+    picked = []
+    groups = set()
+    for candidate in ranked_candidates(idx, initial_pool=top_n * 8):
+        name = medicine_df["name"].iat[candidate]
+        if candidate == idx or name == query_name:
+            continue
+        
+        # Same maker and same composition is the same product in another pack;
+        # diverse mode allows only one result per manufacturer
+        manufacturer = medicine_df["manufacturer_name"].iat[candidate]
+        group = manufacturer if diverse else (medicine_df["composition_key"].iat[candidate], manufacturer)
+        if group in groups:
+            continue
+        groups.add(group)
+        picked.append(candidate)
+        if len(picked) == top_n:
+            break
+    
+    results = []
+    for candidate in picked:
+        # Prices are float32 in the catalog; round back to paise for clean JSON
+        price = medicine_df["price(₹)"].iat[candidate]
+        results.append({
+            "name": medicine_df["name"].iat[candidate],
+            "manufacturer_name": medicine_df["manufacturer_name"].iat[candidate],
+            "price(₹)": None if pd.isna(price) else round(float(price), 2),
+        })
+    if sort_by == "price":
+        results.sort(key=lambda r: (r["price(₹)"] is None, r["price(₹)"] or 0))
+    return results
 
 # Function to Recommend Alternatives
-def recommend_medicine(partial_name, top_n=5):
+def recommend_medicine(partial_name, top_n=5, sort_by="similarity", diverse=False):
     if medicine_df is None or tfidf_matrix is None:
         return None, "Medicine database not available."
     
@@ -273,138 +371,313 @@ def recommend_medicine(partial_name, top_n=5):
     if not best_match:
         return None, f"No close match found for '{partial_name}'."
 
-    idx = medicine_df[medicine_df["name"] == best_match].index[0]
-    sim_scores = cosine_similarity(tfidf_matrix[idx], tfidf_matrix).flatten()
-    similar_indices = sim_scores.argsort()[-top_n-1:-1][::-1]
-    recommendations = medicine_df.iloc[similar_indices][["name", "manufacturer_name", "price(₹)"]].to_dict(orient="records")
+    idx = name_index.position(best_match)
+    recommendations = select_alternatives(idx, top_n, sort_by, diverse)
 
     return recommendations, best_match
 
 # Function to find medicine name from extracted OCR text
 def find_best_match_medicine(extracted_text):
     """Find the best matching medicine name from OCR extracted text"""
-    if medicine_df is None:
+    if name_index is None:
         return None
     
     # Clean the extracted text
-    text_lower = extracted_text.lower()
-    words = text_lower.split()
-    
-    # Try to find medicine names in the extracted text
-    best_match = None
-    best_score = 0
+    words = extracted_text.lower().split()
     
-    # Check each word and combination of words
-    for i in range(len(words)):
-        for j in range(i + 1, min(i + 4, len(words) + 1)):  # Check up to 3-word combinations
-            phrase = " ".join(words[i:j])
-            if len(phrase) > 2:  # Only check phrases longer than 2 characters
-                result = process.extractOne(phrase, medicine_df["name"])
-                if result and result[1] > best_score and result[1] > 60:  # Lower threshold for OCR
-                    best_match = result[0]
-                    best_score = result[1]
+    # Every 1-3 word combination longer than 2 characters; bare numbers and
+    # batch codes ("650", "01/2024") partially match almost any name, so skip them
+    phrases = [
+        " ".join(words[i:j])
+        for i in range(len(words))
+        for j in range(i + 1, min(i + 4, len(words) + 1))
+    ]
+    phrases = [phrase for phrase in phrases if len(phrase) > 2 and any(c.isalpha() for c in phrase)]
     
-    return best_match if best_score > 60 else None
+    # Score all phrases in batches against the name index (lower threshold for OCR)
+    result = name_index.match_phrases(phrases, score_cutoff=60)
+    return result[0] if result else None
 
 # ----------------------------
 # Load additional CSVs
 # ----------------------------
+# Normalized once into {disease: (diet, precautions, workout)} so every chat message is a dict lookup
 try:
-    diet_df = pd.read_csv(os.path.join(os.path.dirname(__file__), "diet.csv"))
-    precautions_df = pd.read_csv(os.path.join(os.path.dirname(__file__), "precautions.csv"))
-    workout_df = pd.read_csv(os.path.join(os.path.dirname(__file__), "workout.csv"))
-    print("Additional CSV files loaded successfully")
+    disease_advice = load_disease_advice()
+    print(f"Additional CSV files loaded successfully ({len(disease_advice)} diseases)")
 except Exception as e:
     print(f"Warning: Could not load additional CSV files: {e}")
-    diet_df = pd.DataFrame()
-    precautions_df = pd.DataFrame()
-    workout_df = pd.DataFrame()
+    disease_advice = {}
+
+# One compiled pattern over every disease name and synonym, matched in a single pass per answer
+disease_matcher = build_disease_matcher(list(disease_advice) + list(recommendations))
 
 def get_additional_recommendations(disease):
-    try:
-        diet = diet_df[diet_df["disease"] == disease]["recommendation"].tolist() if not diet_df.empty else []
-        precautions = precautions_df[precautions_df["disease"] == disease]["recommendation"].tolist() if not precautions_df.empty else []
-        workout = workout_df[workout_df["disease"] == disease]["recommendation"].tolist() if not workout_df.empty else []
-        return {
-            "diet": diet,
-            "precautions": precautions,
-            "workout": workout
-        }
-    except Exception as e:
-        print(f"Error getting additional recommendations: {e}")
-        return {
-            "diet": [],
-            "precautions": [],
-            "workout": []
-        }
+    advice = disease_advice.get(disease_key(disease), NO_ADVICE)
+    return {
+        "diet": advice.diet,
+        "precautions": advice.precautions,
+        "workout": advice.workout
+    }
+
+# Prompts, footers and the guidance block of every known disease, rendered once at import
+response_templates = TemplateRegistry()
+response_templates.add_guidance({disease: disease_guidance(disease)
+                                 for disease in list(disease_advice) + list(recommendations)})
 
 
 # =============================================================================
 # HOSPITAL MAPS MODULE
 # =============================================================================
 
-# Function to fetch nearby hospitals using OpenStreetMap Overpass API
-def get_nearby_hospitals(lat, lon, radius=20000):  # 20km radius
-    try:
-        overpass_url = "http://overpass-api.de/api/interpreter"
-        query = f"""
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+
+# Function to build the Overpass query for hospitals around a point
+def overpass_hospital_query(lat, lon, radius):
+    # Many hospitals are mapped as building outlines (ways), reported by their centre
+    return f"""
         [out:json];
-        node["amenity"="hospital"](around:{radius},{lat},{lon});
-        out;
+        nwr["amenity"="hospital"](around:{radius},{lat},{lon});
+        out center;
         """
-        response = requests.get(overpass_url, params={"data": query}, timeout=15)
-        data = response.json()
 
-        hospitals = []
-        for element in data.get("elements", []):
-            name = element.get("tags", {}).get("name", "Unknown Hospital")
-            hospital_lat, hospital_lon = element["lat"], element["lon"]
-            
-            # Generate Google Maps URL as per Maps.py format
-            maps_url = f"https://www.google.com/maps/search/?api=1&query={hospital_lat},{hospital_lon}"
-            
-            hospitals.append({
-                "name": name, 
-                "lat": hospital_lat, 
-                "lon": hospital_lon,
-                "maps_url": maps_url
-            })
-        
-        return hospitals
+# Hospital sets are cached per geohash cell, so nearby users share one Overpass query
+hospital_cache = create_hospital_cache()
+
+# Local index built by `python hospital_index.py <extract>`; Overpass is only used without it
+hospital_index = None
+hospital_name_index = None
+
+# Largest page a client can ask for with ?limit=
+MAX_HOSPITAL_PAGE = 200
+
+# Function to fetch nearby hospitals, nearest first, from the local index, the cell cache or OpenStreetMap Overpass API
+def get_nearby_hospitals(lat, lon, radius=20000, bbox=None):  # 20km radius
+    try:
+        if hospital_index is not None:
+            candidates = hospital_index.within(lat, lon, radius)
+        else:
+            candidates = hospital_cache.candidates(lat, lon, radius, fetch_hospitals)
+        return rank_hospitals(candidates, lat, lon, radius, bbox)
     except Exception as e:
         print(f"Error fetching hospitals: {e}")
         return []
 
+# Function to keep hospitals within radius (and bbox) of the point, sorted by distance
+def rank_hospitals(hospitals, lat, lon, radius, bbox=None):
+    if not hospitals:
+        return []
+    lats = np.fromiter((h["lat"] for h in hospitals), dtype=np.float64, count=len(hospitals))
+    lons = np.fromiter((h["lon"] for h in hospitals), dtype=np.float64, count=len(hospitals))
+    
+    # Cheap box checks first: the radius' own bounding box, then the client's (min_lat, min_lon, max_lat, max_lon)
+    angle = radius / 1000 / EARTH_RADIUS_KM
+    lat_margin = np.degrees(angle)
+    mask = np.abs(lats - lat) <= lat_margin
+    # Longitude extent of the circle; near the poles it spans every longitude
+    lon_ratio = np.sin(angle) / np.cos(np.radians(lat))
+    if lon_ratio < 1:
+        lon_delta = np.abs((lons - lon + 180) % 360 - 180)
+        mask &= lon_delta <= np.degrees(np.arcsin(lon_ratio))
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        mask &= (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+    rows = np.flatnonzero(mask)
+    
+    distances = haversine_km_array(lat, lon, lats[rows], lons[rows])
+    keep = distances <= radius / 1000
+    rows, distances = rows[keep], distances[keep]
+    # Stable sort keeps the source order on ties, so pages don't shift between requests
+    order = np.argsort(distances, kind='stable')
+    
+    ranked = []
+    for row, distance in zip(rows[order], distances[order]):
+        hospital = hospitals[row]
+        entry = hospital_record(hospital["name"], hospital["lat"], hospital["lon"])
+        # Extra fields of the source entries (e.g. match_score) are kept
+        entry.update((key, value) for key, value in hospital.items() if key not in entry)
+        entry["distance_km"] = round(float(distance), 3)
+        ranked.append(entry)
+    return ranked
+
+# Function to search hospitals near a point by name, best match first, then nearest
+def search_nearby_hospitals(lat, lon, search_term, radius=20000):
+    if not search_term.strip():
+        return get_nearby_hospitals(lat, lon, radius)
+    try:
+        if hospital_index is not None:
+            # Only names within the radius compete for the fuzzy shortlist
+            matches = hospital_name_index.search(search_term, rows=hospital_index.rows_within(lat, lon, radius))
+            rows = sorted(matches)
+            candidates = hospital_index.records(rows)
+        else:
+            hospitals_list, name_index = hospital_cache.searchable(lat, lon, radius, fetch_hospitals, HospitalNameIndex)
+            matches = name_index.search(search_term)
+            rows = sorted(matches)
+            candidates = [hospitals_list[row] for row in rows]
+        
+        # Distances and the radius check come from the usual nearest-first ranking
+        ranked = rank_hospitals([dict(hospital, match_score=matches[row]) for row, hospital in zip(rows, candidates)],
+                                lat, lon, radius)
+        # Already nearest-first, so the stable sort keeps equal scores in distance order
+        ranked.sort(key=lambda h: -h["match_score"])
+        return ranked
+    except Exception as e:
+        print(f"Error searching hospitals: {e}")
+        return []
+
+# Function to read the /api/hospitals query string: lat, lon and optional limit, cursor, bbox
+def hospital_query_params(args):
+    lat = args.get("lat", type=float)
+    lon = args.get("lon", type=float)
+    if lat is None or lon is None:
+        raise ValueError("Latitude and Longitude are required")
+    
+    limit = args.get("limit", type=int)
+    if limit is not None and not 1 <= limit <= MAX_HOSPITAL_PAGE:
+        raise ValueError(f"limit must be between 1 and {MAX_HOSPITAL_PAGE}")
+    
+    # The cursor is the offset of the next page in the distance-sorted list
+    cursor = args.get("cursor", "0")
+    if not cursor.isdigit():
+        raise ValueError("Invalid cursor")
+    
+    bbox = args.get("bbox")
+    if bbox:
+        try:
+            bbox = tuple(float(value) for value in bbox.split(","))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            raise ValueError("bbox must be min_lat,min_lon,max_lat,max_lon")
+    
+    return {"lat": lat, "lon": lon, "limit": limit, "offset": int(cursor), "bbox": bbox or None}
+
+# Function to cut one page out of the ranked hospitals
+def hospitals_page(hospitals_list, offset=0, limit=None):
+    end = len(hospitals_list) if limit is None else offset + limit
+    return {
+        "hospitals": hospitals_list[offset:end],
+        "total": len(hospitals_list),
+        "next_cursor": str(end) if end < len(hospitals_list) else None
+    }
+
+# Function to query Overpass for hospitals around a point
+def fetch_hospitals(lat, lon, radius):
+    response = requests.get(OVERPASS_URL, params={"data": overpass_hospital_query(lat, lon, radius)}, timeout=15)
+    # Rate-limit and error pages must not end up cached as "no hospitals"
+    response.raise_for_status()
+    return parse_hospitals(response.json())
+
+# Function to convert Overpass elements into the hospital list returned by the API
+def parse_hospitals(data):
+    hospitals = []
+    for element in data.get("elements", []):
+        location = element_location(element)
+        if location is None:
+            continue
+        name = element.get("tags", {}).get("name", "Unknown Hospital")
+        hospitals.append(hospital_record(name, *location))
+    
+    return hospitals
+
+# Function to build one hospital entry of the API response
+def hospital_record(name, hospital_lat, hospital_lon):
+    # Generate Google Maps URL as per Maps.py format
+    maps_url = f"https://www.google.com/maps/search/?api=1&query={hospital_lat},{hospital_lon}"
+    
+    return {
+        "name": name, 
+        "lat": hospital_lat, 
+        "lon": hospital_lon,
+        "maps_url": maps_url
+    }
+
 # =============================================================================
 # API ROUTES
 # =============================================================================
 
+# Dependency checks, run on a background timer rather than per health request
+def probe_ocr():
+    from PIL import Image, ImageDraw
+    test_img = Image.new('RGB', (200, 100), color='white')
+    ImageDraw.Draw(test_img).text((10, 30), "TEST", fill='black')
+    try:
+        return "available" if ocr_engine.extract_text(test_img) else "limited"
+    except OCRBusy:
+        return "busy"
+
+def probe_medicine_index():
+    if medicine_df is None or name_index is None:
+        raise RuntimeError("medicine data not loaded")
+    return f"{len(medicine_df)} medicines"
+
+def probe_gemini():
+    if not GEMINI_API_KEY:
+        raise RuntimeError("missing API key")
+    try:
+        status = gemini_client.ping()
+    except requests.RequestException as e:
+        # The exception text contains the request URL, API key included
+        raise RuntimeError(f"Gemini unreachable ({type(e).__name__})") from None
+    if status != 200:
+        raise RuntimeError(f"Gemini answered HTTP {status}")
+    return "reachable"
+
+def probe_overpass():
+    if hospital_index is not None:
+        return f"offline index ({len(hospital_index)} hospitals)"
+    try:
+        response = requests.get(OVERPASS_URL.rsplit('/', 1)[0] + '/status', timeout=5)
+    except requests.RequestException as e:
+        raise RuntimeError(f"Overpass unreachable ({type(e).__name__})") from None
+    if response.status_code != 200:
+        raise RuntimeError(f"Overpass answered HTTP {response.status_code}")
+    return "reachable"
+
+health_probes = create_health_probes()
+health_probes.register("ocr", probe_ocr)
+health_probes.register("medicine_index", probe_medicine_index, critical=True)
+health_probes.register("gemini", probe_gemini)
+health_probes.register("overpass", probe_overpass)
+
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    """Liveness: the process answers requests (no dependency checks)"""
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness from the last background probe results; 503 until the medicine index is loaded"""
+    health_probes.start()
+    status, probes = health_probes.readiness()
+    return jsonify({
+        "status": status,
+        "probes": probes,
+        "timestamp": datetime.now().isoformat()
+    }), 200 if status in ("ready", "degraded") else 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    # Test OCR availability
-    ocr_status = "unavailable"
-    try:
-        # Create a simple test image with text
-        from PIL import Image, ImageDraw, ImageFont
-        test_img = Image.new('RGB', (200, 100), color='white')
-        draw = ImageDraw.Draw(test_img)
-        draw.text((10, 30), "TEST", fill='black')
-        
-        # Test OCR
-        test_text = pytesseract.image_to_string(test_img).strip()
-        ocr_status = "available" if test_text else "limited"
-    except Exception as e:
-        ocr_status = f"unavailable - {str(e)}"
-    
+    """Health check endpoint (served from the cached probe results)"""
+    health_probes.start()
+    probes = health_probes.results()
+
+    def service_status(name, available="available"):
+        result = probes.get(name)
+        if result is None:
+            return "checking"
+        return available if result["ok"] else f"unavailable - {result['detail']}"
+
     return jsonify({
         "status": "healthy",
         "services": {
-            "chatbot": "available" if GEMINI_API_KEY else "unavailable - missing API key",
+            "chatbot": service_status("gemini") if GEMINI_API_KEY else "unavailable - missing API key",
             "medicine_recommendations": "available" if medicine_df is not None else "unavailable",
-            "hospital_maps": "available",
-            "ocr": ocr_status
+            "hospital_maps": service_status("overpass"),
+            "ocr": service_status("ocr", probes["ocr"]["detail"] if "ocr" in probes else None)
         },
+        "probes": probes,
         "config": {
             "gemini_api_configured": bool(GEMINI_API_KEY),
             "env_file_path": backend_env_path,
@@ -430,69 +703,25 @@ def chat():
             return jsonify({"error": "Gemini API key not configured. Please add GEMINI_API_KEY to backend/.env file"}), 503
 
         # Get response from Gemini API with language support
-        response = gemini_response(user_input, language, response_language)
-
-        # Extract disease from response
-        detected_disease = None
-        for disease in recommendations.keys():
-            if disease in response.lower():
-                detected_disease = disease
-                break
-        
-        # Generate formatted response based on disease detection
-        if detected_disease:
-            additional_recs = get_additional_recommendations(detected_disease)
-            formatted_response = f"**{detected_disease.title()} Treatment Guidelines**\n\n{response}\n\n"
-            
-            # Add structured recommendations
-            recommendations_text = get_recommendations(detected_disease)
-            formatted_response += f"**Immediate Care Instructions:**\n{recommendations_text}\n\n"
-            
-            # Add additional recommendations with proper formatting
-            if additional_recs.get('diet'):
-                diet_items = '\n• '.join(additional_recs.get('diet', []))
-                formatted_response += f"**📋 Dietary Recommendations:**\n• {diet_items}\n\n"
-            if additional_recs.get('precautions'):
-                precaution_items = '\n• '.join(additional_recs.get('precautions', []))
-                formatted_response += f"**⚠️ Important Precautions:**\n• {precaution_items}\n\n"
-            if additional_recs.get('workout'):
-                workout_items = '\n• '.join(additional_recs.get('workout', []))
-                formatted_response += f"**💪 Exercise Guidelines:**\n• {workout_items}\n\n"
-            
-            response = formatted_response
-        
-        # Add professional disclaimer in appropriate language
-        disclaimers = {
-            'hi': "\n**⚠️ चिकित्सा अस्वीकरण:**\nयह जानकारी केवल शैक्षिक उद्देश्यों के लिए है। उचित चिकित्सा निदान और उपचार के लिए कृपया किसी स्वास्थ्य पेशेवर से सलाह लें।\n\n",
-            'ta': "\n**⚠️ மருத்துவ மறுப்பு:**\nஇந்த தகவல் கல்வி நோக்கங்களுக்காக மட்டுமே. சரியான மருத்துவ கண்டறிதல் மற்றும் சிகிச்சைக்கு தயவுசெய்து ஒரு சுகாதார நிபுணரை ஆலோசிக்கவும்।\n\n",
-            'te': "\n**⚠️ వైద్య నిరాకరణ:**\nఈ సమాచారం కేవలం విద్యా ప్రయోజనాల కోసం మాత్రమే. సరైన వైద్య నిర్ధారణ మరియు చికిత్స కోసం దయచేసి ఆరోగ్య నిపుణుడిని సంప్రదించండి।\n\n",
-            'bn': "\n**⚠️ চিকিৎসা দাবিত্যাগ:**\nএই তথ্য শুধুমাত্র শিক্ষাগত উদ্দেশ্যে। যথাযথ চিকিৎসা নির্ণয় এবং চিকিৎসার জন্য দয়া করে একজন স্বাস্থ্য পেশাদারের সাথে পরামর্শ করুন।\n\n",
-            'en': "\n**⚠️ Medical Disclaimer:**\nThis information is for educational purposes only. Please consult with a healthcare professional for proper medical diagnosis and treatment.\n\n"
-        }
-        
-        appointment_labels = {
-            'hi': "**📅 अपॉइंटमेंट की जानकारी:**\n",
-            'ta': "**📅 நியமன தகவல்:**\n",
-            'te': "**📅 అపాయింట్మెంట్ సమాచారం:**\n",
-            'bn': "**📅 অ্যাপয়েন্টমেন্ট তথ্য:**\n",
-            'en': "**📅 Appointment Information:**\n"
-        }
-        
-        response += disclaimers.get(response_language, disclaimers['en'])
+        answer = gemini_response(user_input, language, response_language)
 
-        # Automatically book an appointment with better formatting
-        appointment_info = book_appointment()
-        response += appointment_labels.get(response_language, appointment_labels['en']) + appointment_info
+        # Add disease guidance, disclaimer and appointment details
+        response = build_chat_response(answer, response_language)
 
-        # Convert response to speech if engine is available
-        if engine:
+        result = {"response": response}
+        # Audio is rendered in the background; the client fetches it from /api/tts/<id>
+        if request.json.get('speak'):
             try:
-                engine.say(response)
-                engine.runAndWait()
-            except:
-                pass  # Ignore TTS errors
+                # The appointment time changes every second; without it the same answer reuses its audio
+                audio_id = tts_service.submit(build_chat_response(answer, response_language, appointment=False),
+                                              response_language)
+                result["audio"] = {"id": audio_id, "url": f"/api/tts/{audio_id}"}
+            except Exception as e:
+                # The text answer is still worth sending without audio
+                print(f"Text-to-speech submit failed: {e}")
+                result["audio"] = {"error": "Text-to-speech is unavailable"}
 
-        return jsonify({"response": response})
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": f"Chat service error: {str(e)}"}), 500
 
@@ -513,68 +742,39 @@ def chat_stream():
 
         def generate():
             try:
-                # Get response from Gemini API with language support
-                response = gemini_response(user_input, language, response_language)
-
-                # Extract disease from response
-                detected_disease = None
-                for disease in recommendations.keys():
-                    if disease in response.lower():
-                        detected_disease = disease
-                        break
-                
-                # Generate formatted response based on disease detection
-                if detected_disease:
-                    additional_recs = get_additional_recommendations(detected_disease)
-                    formatted_response = f"**{detected_disease.title()} Treatment Guidelines**\n\n{response}\n\n"
-                    
-                    # Add structured recommendations
-                    recommendations_text = get_recommendations(detected_disease)
-                    formatted_response += f"**Immediate Care Instructions:**\n{recommendations_text}\n\n"
-                    
-                    # Add additional recommendations with proper formatting
-                    if additional_recs.get('diet'):
-                        diet_items = '\n• '.join(additional_recs.get('diet', []))
-                        formatted_response += f"**📋 Dietary Recommendations:**\n• {diet_items}\n\n"
-                    if additional_recs.get('precautions'):
-                        precaution_items = '\n• '.join(additional_recs.get('precautions', []))
-                        formatted_response += f"**⚠️ Important Precautions:**\n• {precaution_items}\n\n"
-                    if additional_recs.get('workout'):
-                        workout_items = '\n• '.join(additional_recs.get('workout', []))
-                        formatted_response += f"**💪 Exercise Guidelines:**\n• {workout_items}\n\n"
-                    
-                    response = formatted_response
-                
-                # Add professional disclaimer in appropriate language
-                disclaimers = {
-                    'hi': "\n**⚠️ चिकित्सा अस्वीकरण:**\nयह जानकारी केवल शैक्षिक उद्देश्यों के लिए है। उचित चिकित्सा निदान और उपचार के लिए कृपया किसी स्वास्थ्य पेशेवर से सलाह लें।\n\n",
-                    'ta': "\n**⚠️ மருத்துவ மறுப்பு:**\nஇந்த தகவல் கல்வி நோக்கங்களுக்காக மட்டுமே. சரியான மருத்துவ கண்டறிதல் மற்றும் சிகிச்சைக்கு தயவுசெய்து ஒரு சுகாதார நிபுணரை ஆலோசிக்கவும்।\n\n",
-                    'te': "\n**⚠️ వైద్య నిరాకరణ:**\nఈ సమాచారం కేవలం విద్యా ప్రయోజనాల కోసం మాత్రమే. సరైన వైద్య నిర్ధారణ మరియు చికిత్స కోసం దయచేసి ఆరోగ్య నిపుణుడిని సంప్రదించండి।\n\n",
-                    'bn': "\n**⚠️ চিকিৎসা দাবিত্যাগ:**\nএই তথ্য শুধুমাত্র শিক্ষাগত উদ্দেশ্যে। যথাযথ চিকিৎসা নির্ণয় এবং চিকিৎসার জন্য দয়া করে একজন স্বাস্থ্য পেশাদারের সাথে পরামর্শ করুন।\n\n",
-                    'en': "\n**⚠️ Medical Disclaimer:**\nThis information is for educational purposes only. Please consult with a healthcare professional for proper medical diagnosis and treatment.\n\n"
-                }
-                
-                appointment_labels = {
-                    'hi': "**📅 अपॉइंटमेंट की जानकारी:**\n",
-                    'ta': "**📅 நியமன தகவல்:**\n",
-                    'te': "**📅 అపాయింట్మెంట్ సమాచారం:**\n",
-                    'bn': "**📅 অ্যাপয়েন্টমেন্ট তথ্য:**\n",
-                    'en': "**📅 Appointment Information:**\n"
-                }
-                
-                response += disclaimers.get(response_language, disclaimers['en'])
-
-                # Automatically book an appointment with better formatting
-                appointment_info = book_appointment()
-                response += appointment_labels.get(response_language, appointment_labels['en']) + appointment_info
-
-                # Stream the response
-                for chunk in stream_response(response):
-                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-                
+                response = cached_answer(user_input, response_language)
+                if response is not None:
+                    yield f"data: {json.dumps({'chunk': response})}\n\n"
+                else:
+                    # Forward model text as Gemini produces it
+                    parts = []
+                    stream = gemini_client.stream_generate_content(build_medical_prompt(user_input, response_language))
+                    for chunk in stream:
+                        # Same whitespace cleanup as format_medical_response, per chunk
+                        chunk = re.sub(r'[ \t]+', ' ', chunk)
+                        parts.append(chunk)
+                        yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+                    response = "".join(parts)
+                    if not response.strip():
+                        # Blocked or empty answer: same message as the non-streaming endpoint
+                        response = "I'm sorry, but I couldn't process your request. Please try again."
+                        yield f"data: {json.dumps({'chunk': response})}\n\n"
+                    elif stream.finish_reason == "STOP":
+                        # Only complete answers are cached, never blocked, cut-off or empty ones
+                        remember_answer(user_input, response_language, format_medical_response(response))
+
+                # Disease guidance can only be chosen once the full answer is known
+                diseases = detect_diseases(response)
+                if diseases:
+                    title, guidance = treatment_guidelines(diseases)
+                    guidance = f"\n\n{title}\n\n" + guidance
+                    yield f"data: {json.dumps({'chunk': guidance})}\n\n"
+
+                yield f"data: {json.dumps({'chunk': response_footer(response_language)})}\n\n"
+
                 # Signal end of stream
                 yield f"data: {json.dumps({'done': True})}\n\n"
-                
+
             except Exception as e:
                 yield f"data: {json.dumps({'error': f'Chat service error: {str(e)}'})}\n\n"
 
@@ -584,6 +784,7 @@ def chat_stream():
             headers={
                 'Cache-Control': 'no-cache',
                 'Connection': 'keep-alive',
+                'X-Accel-Buffering': 'no',
                 'Access-Control-Allow-Origin': 'http://localhost:5173',
                 'Access-Control-Allow-Credentials': 'true',
                 'Access-Control-Allow-Headers': 'Content-Type, Authorization, Accept',
@@ -593,6 +794,61 @@ def chat_stream():
     except Exception as e:
         return jsonify({"error": f"Chat service error: {str(e)}"}), 500
 
+@app.route('/api/chat/metrics', methods=['GET'])
+def chat_metrics():
+    """Latency and error counters for outbound chatbot calls"""
+    return jsonify({
+        "gemini": gemini_client.stats.snapshot(),
+        "gemini_first_token": gemini_client.first_token_stats.snapshot(),
+        "response_cache": chat_cache.snapshot(),
+        "semantic_cache": semantic_cache.snapshot(),
+        "tts": tts_service.snapshot()
+    })
+
+@app.route('/api/chat/cache-feedback', methods=['POST'])
+def chat_cache_feedback():
+    """Report that a cached answer did not fit the question; the entry is dropped"""
+    data = request.get_json() or {}
+    user_input = data.get('input')
+    if not user_input:
+        return jsonify({"error": "No input provided"}), 400
+    
+    response_language = data.get('responseLanguage', data.get('language', 'en'))
+    reported = semantic_cache.report_false_hit(user_input, response_language)
+    return jsonify({"reported": reported})
+
+# Text-to-speech endpoints
+@app.route('/api/tts', methods=['POST'])
+def tts():
+    """Queue speech synthesis for a text and return a handle to poll/fetch the WAV"""
+    try:
+        text = request.json.get('text')
+        language = request.json.get('language', 'en')
+        
+        if not text:
+            return jsonify({"error": "No text provided"}), 400
+        
+        audio_id = tts_service.submit(text, language)
+        status = tts_service.status(audio_id)
+        return jsonify({"id": audio_id, "status": status, "url": f"/api/tts/{audio_id}"}), 200 if status == "ready" else 202
+    except Exception as e:
+        return jsonify({"error": f"Text-to-speech error: {str(e)}"}), 500
+
+@app.route('/api/tts/<audio_id>', methods=['GET'])
+def tts_audio(audio_id):
+    """WAV audio for a handle from /api/tts (?wait=<seconds> to block until it is rendered)"""
+    if not tts_service.valid_id(audio_id):
+        return jsonify({"error": "Unknown audio id"}), 404
+    
+    status = tts_service.status(audio_id, wait=min(request.args.get("wait", 0.0, type=float), 30.0))
+    if status == "ready":
+        return send_file(tts_service.path(audio_id), mimetype="audio/wav", max_age=86400)
+    if status == "pending":
+        return jsonify({"id": audio_id, "status": status}), 202
+    if status == "failed":
+        return jsonify({"error": f"Text-to-speech failed: {tts_service.error(audio_id)}"}), 500
+    return jsonify({"error": "Unknown audio id"}), 404
+
 @app.route('/api/voice-chat', methods=['POST'])
 def voice_chat():
     """Voice input processing endpoint"""
@@ -625,7 +881,15 @@ def recommend():
         if not medicine_name:
             return jsonify({"error": "Medicine name is required"}), 400
 
-        recommendations, best_match = recommend_medicine(medicine_name)
+        # Optional selection controls: how many, price-sorted and/or one per manufacturer
+        try:
+            top_n = min(max(int(data.get("top_n", 5)), 1), 50)
+        except (TypeError, ValueError):
+            return jsonify({"error": "top_n must be an integer"}), 400
+        sort_by = "price" if data.get("sort") == "price" else "similarity"
+        diverse = bool(data.get("diverse_manufacturers", False))
+
+        recommendations, best_match = recommend_medicine(medicine_name, top_n, sort_by, diverse)
         if recommendations:
             return jsonify({"search": best_match, "recommendations": recommendations})
         else:
@@ -633,6 +897,79 @@ def recommend():
     except Exception as e:
         return jsonify({"error": f"Medicine recommendation error: {str(e)}"}), 500
 
+def recognize_medicine_image(image_data):
+    """(status, payload) of OCR and medicine matching on an uploaded image"""
+    # Without the index every upload would be a 404; a 503 is not cached and the client can retry
+    if medicine_df is None or name_index is None:
+        return 503, {"error": "Medicine database not available."}
+
+    # Preprocess image: bounded size, grayscale, binarized, deskewed, cropped to text
+    image, timings = ocr_preprocessor.run(image_data)
+
+    # Extract text using OCR; the fallback configurations run concurrently
+    try:
+        started = time.perf_counter()
+        extracted_text = ocr_engine.extract_text(image)
+        timings["ocr"] = round((time.perf_counter() - started) * 1000, 2)
+    except OCRBusy as busy:
+        return 429, {"error": f"OCR service is busy, please retry shortly. {busy}"}
+    except Exception as ocr_error:
+        print(f"OCR Error: {ocr_error}")
+        error_msg = str(ocr_error)
+        if "tesseract" in error_msg.lower() or "not found" in error_msg.lower():
+            return 500, {
+                "error": "Tesseract OCR engine is not installed or not found in PATH.",
+                "suggestions": [
+                    "Install Tesseract OCR from: https://github.com/UB-Mannheim/tesseract/wiki",
+                    "For Windows: Download and install from the GitHub releases",
+                    "For macOS: Run 'brew install tesseract'",
+                    "For Ubuntu: Run 'sudo apt install tesseract-ocr'",
+                    "Make sure Tesseract is added to your system PATH",
+                    "Restart the Flask server after installation"
+                ]
+            }
+        else:
+            return 500, {"error": f"OCR processing failed: {error_msg}"}
+    
+    if not extracted_text:
+        return 400, {
+            "error": "No text could be extracted from the image. Please try with a clearer image with visible text.",
+            "suggestions": [
+                "Ensure the image has good lighting",
+                "Make sure text is clearly visible",
+                "Try cropping the image to focus on the medicine name",
+                "Use a higher resolution image"
+            ],
+            "timings_ms": timings
+        }
+
+    print(f"Extracted text: {extracted_text}")  # Debug log
+
+    # Try to find a medicine name in extracted text
+    best_match = find_best_match_medicine(extracted_text)
+    if not best_match:
+        return 404, {
+            "error": "No valid medicine name detected from image",
+            "extracted_text": extracted_text,
+            "suggestions": [
+                "Try uploading an image with a clearer view of the medicine name",
+                "Ensure the medicine name is in English",
+                "Check if the text in the image is readable"
+            ]
+        }
+
+    # Recommend alternatives
+    recommendations, matched_name = recommend_medicine(best_match)
+    if recommendations:
+        return 200, {
+            "extracted_text": extracted_text,
+            "search": matched_name,
+            "recommendations": recommendations,
+            "timings_ms": timings
+        }
+    else:
+        return 404, {"error": matched_name}
+
 @app.route("/api/medicine/recommend-image", methods=["POST"])
 def recommend_image():
     """OCR-based medicine recommendation endpoint"""
@@ -648,109 +985,74 @@ def recommend_image():
         if not file.content_type.startswith('image/'):
             return jsonify({"error": "Please upload a valid image file"}), 400
 
-        # Read and preprocess image
+        # Repeated or re-encoded uploads are answered from the cache without decoding or OCR
         image_data = file.read()
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize image if too small (improve OCR accuracy)
-        width, height = image.size
-        if width < 300 or height < 300:
-            # Scale up small images
-            scale_factor = max(300/width, 300/height)
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-        # Extract text using OCR with custom configuration
-        custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 '
-        
-        try:
-            # Try with custom config first
-            extracted_text = pytesseract.image_to_string(image, config=custom_config).strip()
-            
-            # If no text found, try with default settings
-            if not extracted_text:
-                extracted_text = pytesseract.image_to_string(image).strip()
-                
-            # If still no text, try with different PSM mode
-            if not extracted_text:
-                extracted_text = pytesseract.image_to_string(image, config='--psm 8').strip()
-                
-        except Exception as ocr_error:
-            print(f"OCR Error: {ocr_error}")
-            error_msg = str(ocr_error)
-            if "tesseract" in error_msg.lower() or "not found" in error_msg.lower():
-                return jsonify({
-                    "error": "Tesseract OCR engine is not installed or not found in PATH.",
-                    "suggestions": [
-                        "Install Tesseract OCR from: https://github.com/UB-Mannheim/tesseract/wiki",
-                        "For Windows: Download and install from the GitHub releases",
-                        "For macOS: Run 'brew install tesseract'",
-                        "For Ubuntu: Run 'sudo apt install tesseract-ocr'",
-                        "Make sure Tesseract is added to your system PATH",
-                        "Restart the Flask server after installation"
-                    ]
-                }), 500
-            else:
-                return jsonify({"error": f"OCR processing failed: {error_msg}"}), 500
-        
-        if not extracted_text:
-            return jsonify({
-                "error": "No text could be extracted from the image. Please try with a clearer image with visible text.",
-                "suggestions": [
-                    "Ensure the image has good lighting",
-                    "Make sure text is clearly visible",
-                    "Try cropping the image to focus on the medicine name",
-                    "Use a higher resolution image"
-                ]
-            }), 400
-
-        print(f"Extracted text: {extracted_text}")  # Debug log
-
-        # Try to find a medicine name in extracted text
-        best_match = find_best_match_medicine(extracted_text)
-        if not best_match:
-            return jsonify({
-                "error": "No valid medicine name detected from image",
-                "extracted_text": extracted_text,
-                "suggestions": [
-                    "Try uploading an image with a clearer view of the medicine name",
-                    "Ensure the medicine name is in English",
-                    "Check if the text in the image is readable"
-                ]
-            }), 404
-
-        # Recommend alternatives
-        recommendations, matched_name = recommend_medicine(best_match)
-        if recommendations:
-            return jsonify({
-                "extracted_text": extracted_text,
-                "search": matched_name,
-                "recommendations": recommendations
-            })
-        else:
-            return jsonify({"error": matched_name}), 404
+        started = time.perf_counter()
+        (status, payload), cached = ocr_result_cache.get_or_compute(image_data, recognize_medicine_image)
+        if cached:
+            payload = {**payload, "cache": cached,
+                       "timings_ms": {"cache": round((time.perf_counter() - started) * 1000, 2)}}
+
+        headers = {"Retry-After": "2"} if status in (429, 503) else {}
+        return jsonify(payload), status, headers
     except Exception as e:
         print(f"OCR endpoint error: {str(e)}")  # Debug log
         return jsonify({"error": f"OCR medicine recommendation error: {str(e)}"}), 500
 
+@app.route("/api/medicine/ocr/metrics", methods=["GET"])
+def ocr_metrics():
+    """Per-stage latency of image preprocessing, OCR worker pool load/latency and result cache hits"""
+    return jsonify({
+        "preprocess": ocr_preprocessor.snapshot(),
+        "ocr": ocr_engine.snapshot(),
+        "cache": ocr_result_cache.snapshot()
+    })
+
 # Hospital maps endpoints
 @app.route('/api/hospitals', methods=['GET'])
 def hospitals():
-    """Get nearby hospitals endpoint"""
+    """Get nearby hospitals endpoint, nearest first (?limit=&cursor= pages, ?bbox= prefilter)"""
     try:
-        lat = request.args.get("lat", type=float)
-        lon = request.args.get("lon", type=float)
+        try:
+            params = hospital_query_params(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        hospitals_list = get_nearby_hospitals(params["lat"], params["lon"], bbox=params["bbox"])
+        return jsonify(hospitals_page(hospitals_list, params["offset"], params["limit"]))
+    except Exception as e:
+        return jsonify({"error": f"Hospital search error: {str(e)}"}), 500
+
+@app.route('/api/hospitals/search', methods=['POST'])
+def search_hospitals():
+    """Search nearby hospitals by name (prefix and typo tolerant), answered from the local indexes"""
+    try:
+        data = request.json
+        lat = data.get('lat')
+        lon = data.get('lon')
+        radius = data.get('radius', 20000)
+        search_term = data.get('search', '')
+        limit = data.get('limit')
 
         if lat is None or lon is None:
             return jsonify({"error": "Latitude and Longitude are required"}), 400
-
-        hospitals_list = get_nearby_hospitals(lat, lon)
-        return jsonify({"hospitals": hospitals_list})
+        try:
+            lat, lon, radius = float(lat), float(lon), float(radius)
+            limit = int(limit) if limit else None
+        except (TypeError, ValueError):
+            return jsonify({"error": "lat, lon and radius must be numbers and limit an integer"}), 400
+
+        hospitals_list = search_nearby_hospitals(lat, lon, str(search_term), radius)
+        if limit:
+            hospitals_list = hospitals_list[:max(1, min(limit, MAX_HOSPITAL_PAGE))]
+        
+        return jsonify({
+            "hospitals": hospitals_list,
+            "user_location": {"lat": lat, "lon": lon},
+            "radius": radius,
+            "search_term": search_term,
+            "count": len(hospitals_list)
+        })
     except Exception as e:
         return jsonify({"error": f"Hospital search error: {str(e)}"}), 500
 
@@ -761,15 +1063,27 @@ def hospitals():
 def initialize_app():
     """Initialize the Flask application with all services"""
     print("Initializing Flask AI/ML Services...")
+    print(format_memory("before medicine data"))
     
     # Load medicine data
     if load_medicine_data():
         print("[OK] Medicine recommendation service initialized")
     else:
         print("[ERROR] Medicine recommendation service failed to initialize")
+    print(format_memory("after medicine data"))
     
     print("[OK] Chatbot service initialized")
-    print("[OK] Hospital maps service initialized")
+    
+    # Serve hospital lookups from the offline OSM index when it has been built
+    global hospital_index, hospital_name_index
+    hospital_index = HospitalIndex.load()
+    if hospital_index is not None:
+        hospital_name_index = HospitalNameIndex(hospital_index.names)
+        print(f"[OK] Hospital maps service initialized ({len(hospital_index)} hospitals indexed offline)")
+    else:
+        print("[OK] Hospital maps service initialized (live Overpass lookups)")
+    # Readiness follows the load now rather than at the next probe interval
+    health_probes.run("medicine_index")
     print("Flask AI/ML Services ready!")
 
 if __name__ == "__main__":
@@ -794,3 +1108,15 @@ def _ensure_initialized():
                     print(f"Initialization error during request: {_e}")
                 finally:
                     _initialized = True
+
+def preload_services():
+    """Initialize once up front: in the gunicorn master so forked workers share the
+    loaded data, or at ASGI startup (asgi.py)"""
+    global _initialized
+    with _init_lock:
+        if not _initialized:
+            initialize_app()
+            _initialized = True
+    
+    # Keep the garbage collector from touching (and un-sharing) preloaded objects after fork
+    gc.freeze()
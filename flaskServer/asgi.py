@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""ASGI entry point: async chat and hospital routes, everything else served by the Flask app
+
+Slow upstream calls (Gemini for /api/chat, Overpass for /api/hospitals) are
+awaited on the event loop instead of holding a worker thread, so a single
+process can keep hundreds of them in flight. All other routes are the
+unchanged Flask views, run in the loop's thread pool.
+
+Usage:
+    hypercorn asgi:application --bind 0.0.0.0:8000
+"""
+import asyncio
+import os
+
+import httpx
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from quart import Quart, jsonify, request
+
+import app as flask_app
+from gemini_client import AsyncGeminiClient
+
+# Routes answered by the async handlers below; the Flask views for them stay as the WSGI fallback
+ASYNC_ROUTES = {'/api/chat', '/api/hospitals'}
+
+# Prescription images for /api/medicine/recommend-image go through the WSGI bridge
+MAX_BODY_SIZE = int(os.getenv('MAX_UPLOAD_BYTES', str(16 * 1024 * 1024)))
+
+
+def create_app():
+    """Quart app with the async versions of the chat and hospital endpoints"""
+    quart_app = Quart(__name__)
+
+    # Same API key, retries and metrics as the WSGI client; /api/chat/metrics covers both
+    gemini_client = AsyncGeminiClient(flask_app.GEMINI_API_KEY)
+    gemini_client.stats = flask_app.gemini_client.stats
+    overpass = {}
+
+    @quart_app.before_serving
+    async def startup():
+        await asyncio.to_thread(flask_app.preload_services)
+        await asyncio.to_thread(flask_app.ocr_engine.warm_up)
+        flask_app.health_probes.start()
+        overpass["client"] = httpx.AsyncClient(timeout=15)
+
+    @quart_app.after_serving
+    async def shutdown():
+        await gemini_client.aclose()
+        await overpass["client"].aclose()
+        flask_app.health_probes.stop()
+        flask_app.ocr_engine.shutdown()
+
+    @quart_app.after_request
+    async def add_cors_headers(response):
+        # Mirrors the flask-cors settings in app.py
+        origin = request.headers.get('Origin')
+        if origin in flask_app.CORS_ORIGINS:
+            response.headers['Access-Control-Allow-Origin'] = origin
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+            response.headers['Vary'] = 'Origin'
+            if request.method == 'OPTIONS':
+                response.headers['Access-Control-Allow-Headers'] = ', '.join(flask_app.CORS_HEADERS)
+                response.headers['Access-Control-Allow-Methods'] = ', '.join(flask_app.CORS_METHODS)
+        return response
+
+    async def gemini_response(prompt, response_language):
+        cached = flask_app.cached_answer(prompt, response_language)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await gemini_client.generate_content(flask_app.build_medical_prompt(prompt, response_language))
+            return flask_app.answer_from_gemini(response, prompt, response_language)
+        except Exception as e:
+            return f"I'm sorry, there was an error processing your request: {str(e)}"
+
+    async def nearby_hospitals(lat, lon, radius, bbox=None):
+        if flask_app.hospital_index is not None:
+            return flask_app.get_nearby_hospitals(lat, lon, radius, bbox)
+
+        # Same geohash cell cache as the WSGI route, filled with a non-blocking Overpass call
+        cache = flask_app.hospital_cache
+        key, centre_lat, centre_lon, fetch_radius = cache.cell(lat, lon, radius)
+        hospitals_list = cache.lookup(key)
+        if hospitals_list is None:
+            response = await overpass["client"].get(
+                flask_app.OVERPASS_URL,
+                params={"data": flask_app.overpass_hospital_query(centre_lat, centre_lon, fetch_radius)})
+            response.raise_for_status()
+            hospitals_list = flask_app.parse_hospitals(response.json())
+            cache.store(key, hospitals_list)
+        return flask_app.rank_hospitals(hospitals_list, lat, lon, radius, bbox)
+
+    @quart_app.route('/api/chat', methods=['POST'])
+    async def chat():
+        """Chat endpoint with Gemini AI integration"""
+        try:
+            data = await request.get_json()
+            user_input = data.get('input')
+            language = data.get('language', 'en')
+            response_language = data.get('responseLanguage', language)
+
+            if not user_input:
+                return jsonify({"error": "No input provided"}), 400
+
+            if not flask_app.GEMINI_API_KEY:
+                return jsonify({"error": "Gemini API key not configured. Please add GEMINI_API_KEY to backend/.env file"}), 503
+
+            answer = await gemini_response(user_input, response_language)
+            response = flask_app.build_chat_response(answer, response_language)
+            result = {"response": response}
+            if data.get('speak'):
+                try:
+                    # Without the per-second appointment time the same answer reuses its audio
+                    spoken = flask_app.build_chat_response(answer, response_language, appointment=False)
+                    audio_id = flask_app.tts_service.submit(spoken, response_language)
+                    result["audio"] = {"id": audio_id, "url": f"/api/tts/{audio_id}"}
+                except Exception as e:
+                    # The text answer is still worth sending without audio
+                    print(f"Text-to-speech submit failed: {e}")
+                    result["audio"] = {"error": "Text-to-speech is unavailable"}
+            return jsonify(result)
+        except Exception as e:
+            return jsonify({"error": f"Chat service error: {str(e)}"}), 500
+
+    @quart_app.route('/api/hospitals', methods=['GET'])
+    async def hospitals():
+        """Get nearby hospitals endpoint, nearest first (?limit=&cursor= pages, ?bbox= prefilter)"""
+        try:
+            try:
+                params = flask_app.hospital_query_params(request.args)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            try:
+                hospitals_list = await nearby_hospitals(params["lat"], params["lon"], 20000, params["bbox"])
+            except Exception as e:
+                print(f"Error fetching hospitals: {e}")
+                hospitals_list = []
+            return jsonify(flask_app.hospitals_page(hospitals_list, params["offset"], params["limit"]))
+        except Exception as e:
+            return jsonify({"error": f"Hospital search error: {str(e)}"}), 500
+
+    return quart_app
+
+
+def create_application():
+    """ASGI callable routing ASYNC_ROUTES to Quart and all other requests to Flask"""
+    quart_app = create_app()
+    wsgi_app = AsyncioWSGIMiddleware(flask_app.app, max_body_size=MAX_BODY_SIZE)
+
+    async def application(scope, receive, send):
+        # Lifespan events start and stop the shared clients and preload the medicine index
+        if scope["type"] == "lifespan" or (scope["type"] == "http" and scope["path"] in ASYNC_ROUTES):
+            await quart_app(scope, receive, send)
+        else:
+            await wsgi_app(scope, receive, send)
+
+    return application
+
+
+application = create_application()
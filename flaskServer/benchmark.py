@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Flask AI/ML services, run against local stand-ins
+
+Usage:
+    python benchmark.py gemini [--requests 200] [--concurrency 20]
+    python benchmark.py stream [--chunks 10] [--interval 0.1]
+    python benchmark.py semantic [--log prompts.jsonl] [--threshold 0.85]
+    python benchmark.py load [--requests 400] [--concurrency 200] [--delay 2] [--workers 2]
+    python benchmark.py hospitals [--requests 500] [--delay 0.5]
+    python benchmark.py advice [--messages 20000]
+    python benchmark.py diseases [--vocab 100 1000 5000]
+    python benchmark.py templates [--requests 2000]
+    python benchmark.py ocr [--images 24] [--concurrency 1] [--workers N]
+    python benchmark.py preprocess [--photos 8]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class GeminiStandIn(BaseHTTPRequestHandler):
+    """Answers generateContent like Gemini, after a fixed delay"""
+    protocol_version = "HTTP/1.1"
+    delay = 0.05
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        body = json.dumps({"candidates": [{"content": {"parts": [{"text": "Stay hydrated and rest."}]}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GeminiSSEStandIn(BaseHTTPRequestHandler):
+    """Answers streamGenerateContent with SSE events spaced `interval` seconds apart; the last
+    event carries finish_reason (None: the stream just ends, like a dropped connection)"""
+    protocol_version = "HTTP/1.1"
+    chunks = 10
+    interval = 0.1
+    finish_reason = "STOP"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(self.chunks):
+            time.sleep(self.interval)
+            text = "For fever, rest well. " if i == 0 else f"Sentence {i}. "
+            event = json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]})
+            data = f"data: {event}\r\n\r\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        if self.finish_reason:
+            event = json.dumps({"candidates": [{"finishReason": self.finish_reason}]})
+            data = f"data: {event}\r\n\r\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class OverpassStandIn(BaseHTTPRequestHandler):
+    """Answers Overpass `around` queries from a fixed set of synthetic hospitals, after a delay"""
+    protocol_version = "HTTP/1.1"
+    delay = 0.5
+    hospitals = []
+    queries = 0
+
+    def do_GET(self):
+        from urllib.parse import parse_qs, urlparse
+        from hospital_cache import haversine_km
+
+        type(self).queries += 1
+        query = parse_qs(urlparse(self.path).query)["data"][0]
+        radius, lat, lon = map(float, re.search(r"around:([\d.]+),([-\d.]+),([-\d.]+)", query).groups())
+        time.sleep(self.delay)
+        elements = [{"type": "node", "id": i, "lat": h_lat, "lon": h_lon, "tags": {"name": name}}
+                    for i, (name, h_lat, h_lon) in enumerate(self.hospitals)
+                    if haversine_km(lat, lon, h_lat, h_lon) * 1000 <= radius]
+        body = json.dumps({"elements": elements}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# City centres the synthetic hospitals and query points cluster around
+CITIES = [(28.6139, 77.2090), (19.0760, 72.8777), (12.9716, 77.5946), (22.5726, 88.3639)]
+
+
+def synthetic_hospitals(per_city=400, spread=0.4, seed=7):
+    rng = random.Random(seed)
+    return [(f"Hospital {c}-{i}", lat + rng.uniform(-spread, spread), lon + rng.uniform(-spread, spread))
+            for c, (lat, lon) in enumerate(CITIES) for i in range(per_city)]
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops SYNs under concurrency and skews tail latency
+    request_queue_size = 256
+
+
+def start_stand_in(handler):
+    """Serve the handler on a free localhost port, returns (server, base_url)"""
+    server = StandInServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+STRIP_NAMES = ["DOLO 650", "CROCIN ADVANCE", "AUGMENTIN 625 DUO", "PAN 40", "AZITHRAL 500",
+               "ALLEGRA 120", "MONTAIR LC", "SHELCAL 500", "TELMA 40", "THYRONORM 50"]
+
+
+def synthetic_strips(count, seed=3):
+    """Medicine-strip photos: a printed name on a foil-grey card with noise. Every fourth strip
+    has its print rubbed off, the worst case where every OCR fallback runs and reads nothing."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    strips = []
+    for i in range(count):
+        name = STRIP_NAMES[i % len(STRIP_NAMES)]
+        image = Image.new("RGB", (900, 260), (rng.randint(170, 210),) * 3)
+        draw = ImageDraw.Draw(image)
+        for _ in range(400):
+            x, y = rng.randrange(900), rng.randrange(260)
+            draw.point((x, y), fill=(rng.randint(120, 240),) * 3)
+        if i % 4 == 3:
+            strips.append(("", image))
+            continue
+        ink = (rng.randint(0, 40),) * 3
+        draw.text((40, 80), name, fill=ink, font=ImageFont.load_default(size=72))
+        draw.text((40, 190), "Tablets IP  Batch B%04d" % rng.randrange(10000), fill=ink,
+                  font=ImageFont.load_default(size=28))
+        strips.append((name, image))
+    return strips
+
+
+def synthetic_photos(count, seed=5):
+    """12 MP JPEG phone photos of a medicine strip: tilted up to 12 degrees, lit unevenly, with sensor noise"""
+    import io
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    noise = np.random.default_rng(seed)
+    photos = []
+    for i in range(count):
+        name = STRIP_NAMES[i % len(STRIP_NAMES)]
+        image = Image.new("RGB", (4000, 3000), (120, 110, 100))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((500, 900, 3500, 2100), fill=(200, 200, 205))
+        draw.text((700, 1150), name, fill=(20, 20, 20), font=ImageFont.load_default(size=240))
+        draw.text((700, 1700), "Tablets IP 10x10", fill=(20, 20, 20), font=ImageFont.load_default(size=110))
+        image = image.rotate(rng.uniform(-12, 12), resample=Image.BICUBIC, fillcolor=(120, 110, 100))
+        pixels = np.asarray(image, dtype=np.float32) * np.linspace(0.7, 1.2, 4000)[None, :, None]
+        pixels += noise.normal(0, 6, pixels.shape)
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=90)
+        photos.append((name, buffer.getvalue()))
+    return photos
+
+
+def bench_gemini(args):
+    """Concurrent generateContent calls through the pooled client"""
+    from gemini_client import GeminiClient
+
+    server, base_url = start_stand_in(GeminiStandIn)
+    client = GeminiClient("test-key", base_url=base_url, pool_size=args.concurrency)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        statuses = list(pool.map(lambda _: client.generate_content("fever").status_code, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.requests} calls, concurrency {args.concurrency}: {elapsed:.2f}s")
+    print(f"Non-200 responses: {sum(status != 200 for status in statuses)}")
+    print(f"Client stats: {client.stats.snapshot()}")
+    server.shutdown()
+
+
+def bench_stream(args):
+    """Time to first chunk and total time of /api/chat/stream against an SSE stand-in"""
+    import app
+    from gemini_client import GeminiClient
+
+    GeminiSSEStandIn.chunks = args.chunks
+    GeminiSSEStandIn.interval = args.interval
+    server, base_url = start_stand_in(GeminiSSEStandIn)
+    app.gemini_client = GeminiClient("test-key", base_url=base_url)
+    app._initialized = True  # medicine data isn't needed here
+
+    client = app.app.test_client()
+    started = time.perf_counter()
+    response = client.post('/api/chat/stream', json={"input": "I have fever"}, buffered=False)
+    first_chunk = None
+    events = 0
+    for data in response.response:
+        for line in data.decode().splitlines():
+            if line.startswith("data: ") and "chunk" in json.loads(line[6:]):
+                events += 1
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+    total = time.perf_counter() - started
+
+    print(f"Upstream: {args.chunks} chunks every {args.interval * 1000:.0f}ms")
+    print(f"First chunk after {first_chunk * 1000:.0f}ms, {events} chunks in {total * 1000:.0f}ms")
+    server.shutdown()
+
+
+# Labelled prompts used when no CHAT_PROMPT_LOG file is given; same intent = same answer is fine
+SAMPLE_PROMPTS = [
+    ("fever what to do", "fever"), ("I have fever", "fever"), ("what should I do for fever?", "fever"),
+    ("Fever, what to do", "fever"), ("high fever treatment", "fever"), ("what to do for dengue fever", "dengue"),
+    ("dengue symptoms", "dengue"), ("diabetes diet", "diabetes-diet"), ("diet for diabetes", "diabetes-diet"),
+    ("diabetes diet chart", "diabetes-diet"), ("diabetes symptoms", "diabetes-symptoms"),
+    ("what are the symptoms of diabetes", "diabetes-symptoms"), ("cold and cough remedy", "cold"),
+    ("home remedy for cold and cough", "cold"), ("headache relief", "headache"), ("how to relieve a headache", "headache"),
+    ("migraine headache relief", "migraine"), ("blood pressure diet", "bp-diet"), ("diet for high blood pressure", "bp-diet"),
+    ("I have a headache", "headache"),
+    # Opposite questions that differ in a negation or polarity word; a hit between them is a false hit
+    ("headache with fever", "headache-fever"), ("headache without fever", "headache-no-fever"),
+    ("is it safe to drink alcohol with diabetes", "alcohol-diabetes-safe"),
+    ("is it not safe to drink alcohol with diabetes", "alcohol-diabetes-unsafe"),
+    ("take paracetamol before food", "paracetamol-before-food"),
+    ("take paracetamol after food", "paracetamol-after-food"),
+    ("can I eat sugar with diabetes", "sugar-diabetes"), ("can't I eat sugar with diabetes", "sugar-diabetes-not"),
+]
+
+
+def bench_semantic(args):
+    """Replay logged prompts through the semantic cache and report hits and false hits"""
+    from semantic_cache import SemanticCache
+
+    if args.log:
+        with open(args.log, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        prompts = [(r["prompt"], r.get("language", "en"), r.get("intent")) for r in records]
+    else:
+        prompts = [(prompt, "en", intent) for prompt, intent in SAMPLE_PROMPTS]
+
+    cache = SemanticCache(threshold=args.threshold)
+    false_hits = 0
+    lookup_time = 0.0
+    for prompt, language, intent in prompts:
+        started = time.perf_counter()
+        entry, similarity = cache._nearest(prompt, language)
+        lookup_time += time.perf_counter() - started
+        if entry is not None and similarity >= cache.threshold:
+            cache.hits += 1
+            # A hit is false when both prompts are labelled and the labels differ
+            if intent and entry["answer"] != intent:
+                false_hits += 1
+                print(f"  false hit ({similarity:.2f}): {prompt!r} -> {entry['prompt']!r}")
+        else:
+            cache.misses += 1
+            cache.set(prompt, language, intent or prompt)
+
+    print(f"{len(prompts)} prompts, threshold {args.threshold}")
+    print(f"LLM calls avoided: {cache.hits} ({cache.hits / max(len(prompts), 1):.0%})")
+    print(f"False hits: {false_hits}")
+    print(f"Mean lookup: {lookup_time / max(len(prompts), 1) * 1e6:.0f}us")
+
+
+def bench_hospitals(args):
+    """/api/hospitals lookups from users clustered in a few cities: geohash cell cache vs live Overpass"""
+    import app
+    from hospital_cache import create_hospital_cache
+
+    OverpassStandIn.delay = args.delay
+    OverpassStandIn.hospitals = synthetic_hospitals()
+    server, base_url = start_stand_in(OverpassStandIn)
+    app.OVERPASS_URL = base_url
+    app.hospital_cache = create_hospital_cache()
+
+    rng = random.Random(1)
+    # Users within ~10 km of a city centre, like real traffic from a handful of metros
+    points = [(lat + rng.uniform(-0.1, 0.1), lon + rng.uniform(-0.1, 0.1))
+              for lat, lon in (rng.choice(CITIES) for _ in range(args.requests))]
+
+    latencies = []
+    for lat, lon in points:
+        started = time.perf_counter()
+        app.get_nearby_hospitals(lat, lon)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    # Cached answers must match a direct query at the exact point
+    mismatches = sum(
+        {h["name"] for h in app.get_nearby_hospitals(lat, lon)} != {h["name"] for h in app.fetch_hospitals(lat, lon, 20000)}
+        for lat, lon in points[:20])
+
+    print(f"{args.requests} lookups, Overpass stand-in delay {args.delay * 1000:.0f}ms")
+    print(f"Overpass queries: {OverpassStandIn.queries - 20} ({app.hospital_cache.snapshot()})")
+    print(f"p50 {latencies[len(latencies) // 2] * 1000:.2f}ms, "
+          f"p99 {latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000:.2f}ms")
+    print(f"Result mismatches vs live query: {mismatches}/20")
+    server.shutdown()
+
+
+def bench_advice(args):
+    """Per-message cost of the disease advice lookup vs filtering the three CSV DataFrames"""
+    import pandas as pd
+    from disease_advice import DATA_DIR, disease_key, load_disease_advice
+
+    started = time.perf_counter()
+    advice = load_disease_advice()
+    load_time = time.perf_counter() - started
+
+    diet_df = pd.read_csv(os.path.join(DATA_DIR, "diet.csv"))
+    precautions_df = pd.read_csv(os.path.join(DATA_DIR, "precautions.csv"))
+    workout_df = pd.read_csv(os.path.join(DATA_DIR, "workout.csv"))
+    diseases = [disease_key(d) for d in diet_df["Disease"]]
+
+    def filtered(disease):
+        # What the old per-message code did, with the real column names
+        return (diet_df[diet_df["Disease"].str.lower() == disease]["Diet"].tolist(),
+                precautions_df[precautions_df["Disease"].str.lower() == disease].iloc[:, 2:].values.tolist(),
+                workout_df[workout_df["disease"].str.lower() == disease]["workout"].tolist())
+
+    def per_message(lookup, messages):
+        started = time.perf_counter()
+        for i in range(messages):
+            lookup(diseases[i % len(diseases)])
+        return (time.perf_counter() - started) / messages * 1e6
+
+    dataframe_us = per_message(filtered, min(args.messages, 2000))
+    dict_us = per_message(lambda disease: advice.get(disease), args.messages)
+
+    print(f"Loaded {len(advice)} diseases in {load_time * 1000:.1f}ms (once, at startup)")
+    print(f"DataFrame filters: {dataframe_us:.1f}us/message")
+    print(f"Dict lookup:       {dict_us:.3f}us/message ({dataframe_us / dict_us:,.0f}x faster)")
+
+
+def bench_diseases(args):
+    """Disease detection cost per answer as the vocabulary grows: compiled matcher vs substring loop"""
+    import app
+    from disease_matcher import DiseaseMatcher
+
+    answer = ("For dengue fever, drink plenty of fluids and rest. Paracetamol helps with the temperature; "
+              "avoid aspirin. If you also have diabetes, monitor your blood sugar. डेंगू में आराम करें। ") * 6
+    base = dict(app.disease_matcher.terms)
+    rng = random.Random(5)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+
+    print(f"Answer length: {len(answer)} chars")
+    for size in args.vocab:
+        terms = dict(base)
+        while len(terms) < size:
+            # Made-up disease names sharing prefixes, like real vocabularies do
+            terms[f"{rng.choice(['hepato', 'cardio', 'neuro', 'derma', 'gastro'])}"
+                  f"{''.join(rng.choice(alphabet) for _ in range(rng.randint(4, 9)))}"] = "synthetic"
+        matcher = DiseaseMatcher(terms)
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            found = matcher.find_all(answer)
+        matcher_us = (time.perf_counter() - started) / args.repeat * 1e6
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            lowered = answer.lower()
+            [term for term in terms if term in lowered]
+        loop_us = (time.perf_counter() - started) / args.repeat * 1e6
+
+        print(f"{len(terms):6} terms: matcher {matcher_us:7.1f}us, substring loop {loop_us:8.1f}us  -> {found}")
+
+
+def bench_templates(args):
+    """Per-request allocations of prompt + response assembly: template registry vs rebuilding per call"""
+    import tracemalloc
+    import app
+    from response_templates import APPOINTMENT_LABELS, DISCLAIMERS, LANGUAGE_PROMPTS
+
+    def rebuilt(prompt, answer, language):
+        # The previous approach: language tables and guidance text rebuilt on every request
+        prompts = {lang: dict(config) for lang, config in LANGUAGE_PROMPTS.items()}
+        config = prompts.get(language, prompts['en'])
+        enhanced = f"{config['system']}\n\nUser Question: {prompt}\n\n{config['instructions']}"
+        disclaimers, labels = dict(DISCLAIMERS), dict(APPOINTMENT_LABELS)
+        diseases = app.detect_diseases(answer)
+        if diseases:
+            answer = f"**{diseases[0].title()} Treatment Guidelines**\n\n{answer}\n\n" + app.disease_guidance(diseases[0])
+        footer = disclaimers.get(language, disclaimers['en'])
+        footer += labels.get(language, labels['en']) + app.book_appointment()
+        return enhanced, answer + footer
+
+    def registry(prompt, answer, language):
+        return app.build_medical_prompt(prompt, language), app.build_chat_response(answer, language)
+
+    prompt = "What should I do for dengue?"
+    answer = "Dengue fever needs rest, fluids and paracetamol. Avoid aspirin and ibuprofen."
+    languages = ["en", "hi", "ta", "te", "bn"]
+
+    for label, build in (("rebuilt per request", rebuilt), ("template registry", registry)):
+        build(prompt, answer, "en")  # warm up
+        tracemalloc.start()
+        peaks = []
+        started = time.perf_counter()
+        for i in range(args.requests):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            build(prompt, answer, languages[i % len(languages)])
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        elapsed = time.perf_counter() - started
+        tracemalloc.stop()
+        print(f"{label:20}: peak {sum(peaks) / len(peaks) / 1024:6.1f} KiB/request, "
+              f"{elapsed / args.requests * 1e6:7.1f}us/request (traced)")
+
+
+def bench_ocr(args):
+    """recommend_image OCR per image: fallbacks as sequential subprocesses vs the engine on each backend"""
+    import pytesseract
+    from ocr_engine import OCR_CONFIGS, OCREngine, tesserocr
+
+    try:
+        version = pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        raise SystemExit("tesseract is not installed or not on PATH (see OCR_SETUP.md)")
+
+    def sequential(image):
+        # The original approach: each fallback only after the one before read nothing
+        for _, config in OCR_CONFIGS:
+            text = pytesseract.image_to_string(image, config=config).strip()
+            if text:
+                return text
+        return ""
+
+    strips = synthetic_strips(args.images)
+    runs = [("sequential subprocess", sequential, None)]
+    for backend in ("pytesseract", "tesserocr"):
+        if backend == "tesserocr" and OCREngine.default_backend("eng") != "tesserocr":
+            print("tesserocr engine skipped: " + ("tesserocr not installed" if tesserocr is None
+                                                  else "no eng.traineddata under TESSDATA_PREFIX"))
+            continue
+        engine = OCREngine(workers=args.workers, backend=backend)
+        engine.warm_up()
+        runs.append((f"engine ({backend})", engine.extract_text, engine))
+    print(f"tesseract {version}, {len(strips)} synthetic strips ({len(strips) // 4} unreadable), "
+          f"{args.concurrency} concurrent uploads")
+
+    results = {}
+    for label, extract, engine in runs:
+        def timed(strip):
+            started = time.perf_counter()
+            text = extract(strip[1])
+            return time.perf_counter() - started, text
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            timings = list(pool.map(timed, strips))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency for latency, _ in timings)
+        results[label] = [text for _, text in timings]
+        read = sum(name.replace(" ", "") in text.replace(" ", "").upper()
+                   for (name, _), (_, text) in zip(strips, timings) if name)
+        print(f"{label:22}: p50 {latencies[len(latencies) // 2] * 1000:6.0f}ms, "
+              f"max {latencies[-1] * 1000:6.0f}ms, {len(strips) / elapsed:5.1f} images/s, "
+              f"name read on {read}/{sum(bool(name) for name, _ in strips)}")
+        if engine is not None:
+            stats = engine.snapshot()
+            print(f"{'':22}  {stats['workers']} workers, speculative runs {stats['speculative_runs']}, "
+                  f"per-config p50 " + ", ".join(f"{name} {config['p50_ms']}ms"
+                                                 for name, config in stats["configs"].items()))
+            engine.shutdown()
+
+    baseline = results["sequential subprocess"]
+    for label in list(results)[1:]:
+        same = sum(a == b for a, b in zip(baseline, results[label]))
+        print(f"Identical text, {label} vs sequential: {same}/{len(strips)}")
+
+
+def bench_preprocess(args):
+    """OCR of 12 MP phone photos: decoded as-is (upscale-only resize) vs the OCR preprocessing pipeline"""
+    import io
+    import pytesseract
+    from PIL import Image
+    from ocr_engine import OCREngine
+    from ocr_preprocess import STAGES, OCRPreprocessor
+
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        raise SystemExit("tesseract is not installed or not on PATH (see OCR_SETUP.md)")
+
+    def raw(image_data):
+        # The previous path: full-size RGB decode, only small images were resized
+        return Image.open(io.BytesIO(image_data)).convert("RGB"), {}
+
+    engine = OCREngine()
+    preprocessor = OCRPreprocessor()
+    photos = synthetic_photos(args.photos)
+    print(f"{len(photos)} synthetic 4000x3000 JPEG photos, {engine.workers} OCR workers")
+
+    for label, prepare in (("full-size decode", raw), ("preprocessed", preprocessor.run)):
+        ocr_times, read = [], 0
+        started = time.perf_counter()
+        for name, image_data in photos:
+            image, _ = prepare(image_data)
+            ocr_started = time.perf_counter()
+            text = engine.extract_text(image)
+            ocr_times.append(time.perf_counter() - ocr_started)
+            read += name.replace(" ", "") in text.replace(" ", "").upper()
+        elapsed = time.perf_counter() - started
+        ocr_times.sort()
+        print(f"{label:16}: {elapsed / len(photos) * 1000:6.0f}ms/photo, OCR p50 {ocr_times[len(ocr_times) // 2] * 1000:6.0f}ms "
+              f"max {ocr_times[-1] * 1000:6.0f}ms, name read on {read}/{len(photos)}")
+
+    stages = preprocessor.snapshot()
+    print("Preprocessing p50: " + ", ".join(f"{stage} {stages[stage]['p50_ms']}ms" for stage in STAGES))
+    engine.shutdown()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_load(args):
+    """/api/chat throughput with a slow Gemini: gunicorn sync workers vs the ASGI app"""
+    import requests
+
+    GeminiStandIn.delay = args.delay
+    server, base_url = start_stand_in(GeminiStandIn)
+    env = {**os.environ, "GEMINI_API_BASE": base_url, "GEMINI_MAX_RETRIES": "0",
+           "GEMINI_READ_TIMEOUT": "60",
+           # Every prompt must reach Gemini, so paraphrase hits are switched off
+           "CHAT_SEMANTIC_THRESHOLD": "1.01"}
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    for mode in ("sync", "async"):
+        address = f"127.0.0.1:{free_port()}"
+        if mode == "sync":
+            command = [sys.executable, "-m", "gunicorn", "app:app", "--workers", str(args.workers), "--bind", address]
+        else:
+            command = [sys.executable, "-m", "hypercorn", "asgi:application", "--workers", str(args.workers),
+                       "--bind", address]
+        process = subprocess.Popen(command, cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url = f"http://{address}"
+        try:
+            # Wait until the medicine index is loaded and the server accepts requests
+            deadline = time.monotonic() + args.startup_timeout
+            while True:
+                try:
+                    requests.get(f"{url}/api/chat/metrics", timeout=5)
+                    break
+                except requests.ConnectionError:
+                    if time.monotonic() > deadline or process.poll() is not None:
+                        raise SystemExit(f"{mode} server did not start: {' '.join(command)}")
+                    time.sleep(0.5)
+
+            def call(i):
+                started = time.perf_counter()
+                try:
+                    response = requests.post(f"{url}/api/chat", json={"input": f"{mode} load question {i}"},
+                                             timeout=args.delay * args.requests)
+                    ok = response.status_code == 200
+                except requests.RequestException:
+                    ok = False
+                return time.perf_counter() - started, ok
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = list(pool.map(call, range(args.requests)))
+            elapsed = time.perf_counter() - started
+
+            latencies = sorted(seconds for seconds, _ in results)
+            print(f"{mode:5} ({' '.join(command[2:4])}, {args.workers} workers): "
+                  f"{args.requests / elapsed:.1f} req/s, "
+                  f"p50 {latencies[len(latencies) // 2]:.2f}s, "
+                  f"p99 {latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]:.2f}s, "
+                  f"failed {sum(not ok for _, ok in results)}")
+        finally:
+            process.terminate()
+            process.wait()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gemini = commands.add_parser("gemini", help="pooled Gemini client latency")
+    gemini.add_argument("--requests", type=int, default=200)
+    gemini.add_argument("--concurrency", type=int, default=20)
+    gemini.set_defaults(func=bench_gemini)
+
+    stream = commands.add_parser("stream", help="time to first token of /api/chat/stream")
+    stream.add_argument("--chunks", type=int, default=10)
+    stream.add_argument("--interval", type=float, default=0.1)
+    stream.set_defaults(func=bench_stream)
+
+    semantic = commands.add_parser("semantic", help="replay prompts through the semantic cache")
+    semantic.add_argument("--log", help="JSONL prompt log written via CHAT_PROMPT_LOG (optional 'intent' labels)")
+    semantic.add_argument("--threshold", type=float, default=0.85)
+    semantic.set_defaults(func=bench_semantic)
+
+    load = commands.add_parser("load", help="/api/chat under load: gunicorn sync vs hypercorn ASGI")
+    load.add_argument("--requests", type=int, default=400)
+    load.add_argument("--concurrency", type=int, default=200)
+    load.add_argument("--delay", type=float, default=2.0, help="seconds the Gemini stand-in takes per call")
+    load.add_argument("--workers", type=int, default=2)
+    load.add_argument("--startup-timeout", type=float, default=120)
+    load.set_defaults(func=bench_load)
+
+    hospitals = commands.add_parser("hospitals", help="hospital lookups through the geohash cell cache")
+    hospitals.add_argument("--requests", type=int, default=500)
+    hospitals.add_argument("--delay", type=float, default=0.5, help="seconds the Overpass stand-in takes per query")
+    hospitals.set_defaults(func=bench_hospitals)
+
+    advice = commands.add_parser("advice", help="disease advice lookup cost per chat message")
+    advice.add_argument("--messages", type=int, default=20000)
+    advice.set_defaults(func=bench_advice)
+
+    diseases = commands.add_parser("diseases", help="disease detection cost vs vocabulary size")
+    diseases.add_argument("--vocab", type=int, nargs="+", default=[100, 1000, 5000])
+    diseases.add_argument("--repeat", type=int, default=200)
+    diseases.set_defaults(func=bench_diseases)
+
+    templates = commands.add_parser("templates", help="allocations per chat response assembly")
+    templates.add_argument("--requests", type=int, default=2000)
+    templates.set_defaults(func=bench_templates)
+
+    ocr = commands.add_parser("ocr", help="medicine-strip OCR latency: sequential fallbacks vs concurrent engine")
+    ocr.add_argument("--images", type=int, default=24)
+    ocr.add_argument("--concurrency", type=int, default=1, help="uploads processed at the same time")
+    ocr.add_argument("--workers", type=int, help="OCR_WORKERS (default: one per core)")
+    ocr.set_defaults(func=bench_ocr)
+
+    preprocess = commands.add_parser("preprocess", help="OCR of full-size phone photos with and without preprocessing")
+    preprocess.add_argument("--photos", type=int, default=8)
+    preprocess.set_defaults(func=bench_preprocess)
+
+    args = parser.parse_args()
+    args.func(args)
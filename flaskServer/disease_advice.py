@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Diet, precaution and workout advice per disease, loaded once from the bundled CSVs"""
+import ast
+import os
+from collections import namedtuple
+
+import pandas as pd
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+Advice = namedtuple('Advice', ['diet', 'precautions', 'workout'])
+NO_ADVICE = Advice((), (), ())
+
+# Spelling differences between the source files, mapped to the diet.csv name
+DISEASE_ALIASES = {
+    'peptic ulcer diseae': 'peptic ulcer disease',
+}
+
+
+def disease_key(name):
+    """Lowercase, whitespace-collapsed disease name used as the lookup key"""
+    key = ' '.join(str(name).lower().split())
+    return DISEASE_ALIASES.get(key, key)
+
+
+def _parse_list(value):
+    # diet.csv stores Python list literals as strings: "['Antifungal Diet', 'Probiotics']"
+    try:
+        items = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        items = [value]
+    if isinstance(items, str):
+        items = [items]
+    return tuple(str(item).strip() for item in items if str(item).strip())
+
+
+def load_disease_advice(data_dir=DATA_DIR):
+    """{disease key: Advice(diet, precautions, workout)} with every field a tuple of strings"""
+    diet_df = pd.read_csv(os.path.join(data_dir, "diet.csv"))
+    precautions_df = pd.read_csv(os.path.join(data_dir, "precautions.csv"))
+    workout_df = pd.read_csv(os.path.join(data_dir, "workout.csv"))
+
+    diet = {disease_key(disease): _parse_list(items) for disease, items in zip(diet_df["Disease"], diet_df["Diet"])}
+
+    precaution_columns = [column for column in precautions_df.columns if column.startswith("Precaution_")]
+    precautions = {}
+    for row in precautions_df[["Disease", *precaution_columns]].itertuples(index=False):
+        precautions[disease_key(row[0])] = tuple(str(value).strip() for value in row[1:]
+                                                 if pd.notna(value) and str(value).strip())
+
+    # One row per item, in file order
+    workout = {}
+    for disease, item in zip(workout_df["disease"], workout_df["workout"]):
+        if pd.notna(item) and str(item).strip():
+            workout.setdefault(disease_key(disease), []).append(str(item).strip())
+
+    return {
+        key: Advice(diet.get(key, ()), precautions.get(key, ()), tuple(workout.get(key, ())))
+        for key in sorted(set(diet) | set(precautions) | set(workout))
+    }
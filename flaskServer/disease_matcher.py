@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Finds every known disease mentioned in a text with one compiled regex"""
+import re
+
+# Extra names per disease key (English variants, transliterations and Indian-language terms).
+# Keys are disease_advice keys, plus the diseases that only have Do's/Don'ts in app.py.
+# Short or shared words stay out ("tb" is also tablespoon, "stroke" also heat stroke, an
+# HIV test is not AIDS): a wrong match adds care instructions for a disease nobody has.
+DISEASE_SYNONYMS = {
+    'fever': ['fever', 'high temperature', 'bukhar', 'बुखार', 'ज्वर', 'காய்ச்சல்', 'జ్వరం', 'জ্বর'],
+    # Bare "cold" is usually a temperature ("cold room", "cold packs"); only illness phrasings count
+    'common cold': ['common cold', 'have a cold', 'has a cold', 'had a cold', 'having a cold', 'got a cold',
+                    'catch a cold', 'catching a cold', 'caught a cold', 'cold and cough', 'cough and cold',
+                    'cold and flu', 'head cold', 'runny nose', 'sardi jukam', 'सर्दी जुकाम',
+                    'जुकाम', 'ஜலதோஷம்', 'జలుబు', 'সর্দি'],
+    'diabetes': ['diabetes', 'diabetic', 'madhumeh', 'मधुमेह', 'நீரிழிவு', 'మధుమేహం', 'ডায়াবেটিস'],
+    'hypertension': ['high blood pressure', 'high bp', 'उच्च रक्तचाप', 'உயர் இரத்த அழுத்தம்', 'అధిక రక్తపోటు',
+                     'উচ্চ রক্তচাপ'],
+    'malaria': ['मलेरिया', 'மலேரியா', 'మలేరియా', 'ম্যালেরিয়া'],
+    'dengue': ['dengue fever', 'डेंगू', 'டெங்கு', 'డెంగ్యూ', 'ডেঙ্গু'],
+    'typhoid': ['typhoid fever', 'enteric fever', 'टाइफाइड', 'டைபாய்டு', 'టైఫాయిడ్', 'টাইফয়েড'],
+    'tuberculosis': ['टीबी', 'क्षय रोग', 'காசநோய்', 'క్షయ', 'যক্ষ্মা'],
+    'jaundice': ['पीलिया', 'மஞ்சள் காமாலை', 'కామెర్లు', 'জন্ডিস'],
+    'migraine': ['माइग्रेन', 'ஒற்றைத் தலைவலி', 'మైగ్రేన్', 'মাইগ্রেন'],
+    'chicken pox': ['chickenpox', 'varicella', 'चिकनपॉक्स', 'छोटी माता', 'சின்னம்மை', 'ఆటలమ్మ', 'জলবসন্ত'],
+    'pneumonia': ['निमोनिया', 'நிமோனியா', 'న్యుమోనియా', 'নিউমোনিয়া'],
+    'heart attack': ['myocardial infarction', 'दिल का दौरा', 'மாரடைப்பு', 'గుండెపోటు', 'হার্ট অ্যাটাক'],
+    'bronchial asthma': ['asthma', 'दमा', 'अस्थमा', 'ஆஸ்துமா', 'ఆస్తమా', 'হাঁপানি'],
+    'dimorphic hemmorhoids(piles)': ['piles', 'hemorrhoids', 'haemorrhoids', 'बवासीर', 'மூலநோய்', 'మొలలు', 'অর্শ'],
+    '(vertigo) paroymsal positional vertigo': ['vertigo', 'bppv', 'चक्कर'],
+    'paralysis (brain hemorrhage)': ['paralysis', 'brain hemorrhage', 'brain stroke', 'paralytic stroke', 'लकवा'],
+    'gerd': ['acid reflux', 'gastroesophageal reflux', 'एसिडिटी'],
+    'urinary tract infection': ['uti', 'urine infection', 'मूत्र संक्रमण'],
+    'peptic ulcer disease': ['peptic ulcer', 'stomach ulcer', 'पेट का अल्सर'],
+    'osteoarthristis': ['osteoarthritis'],
+    'arthritis': ['गठिया'],
+    'aids': ['एड्स'],
+    'hypothyroidism': ['underactive thyroid'],
+    'hyperthyroidism': ['overactive thyroid'],
+    'hypoglycemia': ['low blood sugar'],
+    'fungal infection': ['ringworm', 'दाद'],
+    'acne': ['pimples', 'मुंहासे'],
+    'gastroenteritis': ['stomach flu', 'diarrhoea', 'diarrhea', 'दस्त'],
+    'varicose veins': ['वैरिकोज वेन्स'],
+    'psoriasis': ['सोरायसिस'],
+    'allergy': ['allergies', 'एलर्जी'],
+}
+
+# Indian scripts (Devanagari through Malayalam): vowel signs are not \w, so they count as letters here
+_LETTERS = r'\wऀ-෿'
+
+
+# Viramas (vowel killers) of the Indian scripts; a word-final one disappears when a suffix is added
+_VIRAMAS = '\u094d\u09cd\u0a4d\u0acd\u0b4d\u0bcd\u0c4d\u0ccd\u0d4d'
+
+
+def _normalize(term):
+    # காய்ச்சல் (fever) + உக்கு -> காய்ச்சலுக்கு, so terms are matched without their final virama
+    return ' '.join(term.casefold().split()).rstrip(_VIRAMAS)
+
+
+def _trie_pattern(terms):
+    """Regex alternation of the terms, factored by common prefixes so matching stays
+    proportional to the text length rather than the vocabulary size"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def emit(node):
+        ending = '' in node
+        branches = []
+        for char in sorted(k for k in node if k):
+            # Any run of whitespace between words
+            atom = r'\s+' if char == ' ' else re.escape(char)
+            branches.append(atom + emit(node[char]))
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Longer matches are tried first; the shorter term is the fallback
+        return f'(?:{body})?' if ending else body
+
+    return emit(trie)
+
+
+class DiseaseMatcher:
+    """Single-pass matcher over disease names and synonyms.
+
+    Latin-script terms must stand as whole words ("head cold" does not
+    match "forehead colder"); terms in Indian scripts only need a word start, since
+    suffixes attach directly to the word (காய்ச்சலுக்கு, "for fever").
+    """
+
+    def __init__(self, terms):
+        self.terms = {_normalize(term): key for term, key in terms.items() if term.strip()}
+        latin = [term for term in self.terms if term.isascii()]
+        other = [term for term in self.terms if not term.isascii()]
+
+        alternatives = []
+        if latin:
+            alternatives.append(rf'\b{_trie_pattern(latin)}\b')
+        if other:
+            alternatives.append(rf'(?<![{_LETTERS}]){_trie_pattern(other)}')
+        self.pattern = re.compile('|'.join(alternatives) or r'(?!)', re.IGNORECASE)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def find_all(self, text):
+        """Disease keys mentioned in the text, in order of first mention"""
+        found = {}
+        for match in self.pattern.finditer(text):
+            key = self.terms.get(_normalize(match.group(0)))
+            if key is not None:
+                found.setdefault(key, None)
+        return list(found)
+
+
+def build_disease_matcher(disease_keys, synonyms=DISEASE_SYNONYMS):
+    """Matcher over the given disease keys (parentheses dropped, "hemmorhoids(piles)" ->
+    "hemmorhoids piles") plus synonyms"""
+    terms = {}
+    for key in disease_keys:
+        terms.setdefault(' '.join(re.sub(r'[()]', ' ', key).split()), key)
+    for key, names in synonyms.items():
+        for name in names:
+            terms.setdefault(name, key)
+    return DiseaseMatcher(terms)
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Pooled, retrying HTTP client for the Gemini API"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+try:
+    import httpx  # only needed by AsyncGeminiClient (ASGI serving mode)
+except ImportError:
+    httpx = None
+
+# Point GEMINI_API_BASE at a local stand-in server to exercise the client offline
+GEMINI_API_BASE = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+
+# Rate limiting and transient server errors are worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def connect_failed(exc):
+    """True if a requests exception means the request never reached Gemini.
+
+    Only then is a retry safe: after a read timeout or a dropped connection
+    Gemini may already have processed (and billed) the POST.
+    """
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    # Refused connections and DNS failures: requests wraps urllib3's MaxRetryError(reason=NewConnectionError)
+    reason = getattr(exc.args[0], 'reason', None) if exc.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+
+class GeminiError(Exception):
+    """Non-200 answer from Gemini"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"Error: {status_code}, {text}")
+        self.status_code = status_code
+
+
+class LatencyStats:
+    """Rolling window of call latencies with percentile snapshots"""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+
+    def record(self, seconds, ok, retries=0):
+        with self._lock:
+            self._samples.append(seconds)
+            self.calls += 1
+            self.retries += retries
+            if not ok:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            calls, errors, retries = self.calls, self.errors, self.retries
+
+        def percentile(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        return {
+            "calls": calls,
+            "errors": errors,
+            "retries": retries,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+        }
+
+
+class GeminiRetryMixin:
+    """Configuration, retry backoff and latency metrics shared by the sync and async clients"""
+
+    def __init__(self, api_key, base_url=GEMINI_API_BASE, model=GEMINI_MODEL,
+                 pool_size=None, max_retries=None, connect_timeout=None, read_timeout=None,
+                 total_timeout=None, backoff_base=0.5, backoff_cap=8.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('GEMINI_MAX_RETRIES', '2'))
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else float(os.getenv('GEMINI_CONNECT_TIMEOUT', '3.05')),
+            read_timeout if read_timeout is not None else float(os.getenv('GEMINI_READ_TIMEOUT', '10')),
+        )
+        # All attempts and backoff together; keep it below gunicorn's worker timeout (30s by default)
+        self.total_timeout = total_timeout if total_timeout is not None else float(os.getenv('GEMINI_TOTAL_TIMEOUT', '25'))
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.pool_size = pool_size or int(os.getenv('GEMINI_POOL_SIZE', '20'))
+        self.stats = LatencyStats()
+
+    def url(self, method):
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    def _backoff(self, attempt, response=None):
+        # Honour Retry-After on 429s, otherwise exponential backoff with full jitter
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def _attempt_timeout(self, deadline):
+        # (connect, read) for the next attempt, cut down to what is left before the deadline
+        remaining = max(deadline - time.perf_counter(), 0.01)
+        return min(self.timeout[0], remaining), min(self.timeout[1], remaining)
+
+    def _retry_delay(self, attempt, deadline, response=None):
+        """Backoff before the next attempt, or None if retries are used up or there is no time left for one"""
+        if attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt, response)
+        if time.perf_counter() + delay + self.timeout[0] > deadline:
+            return None
+        return delay
+
+
+class GeminiClient(GeminiRetryMixin):
+    """Keeps TCP/TLS connections to Gemini alive across requests and threads"""
+
+    def __init__(self, api_key, **kwargs):
+        super().__init__(api_key, **kwargs)
+        self.first_token_stats = LatencyStats()
+        self.session = self._open_session()
+
+    def _open_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({"Content-Type": "application/json"})
+        return session
+
+    def post(self, method, payload, params_extra=None, **kwargs):
+        """POST to a model method, retrying 429/5xx and failures to connect.
+
+        All attempts finish within total_timeout. Returns the final
+        requests.Response; raises the last exception if no attempt got a
+        response at all.
+        """
+        started = time.perf_counter()
+        deadline = started + self.total_timeout
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.url(method), params={"key": self.api_key, **(params_extra or {})},
+                                             json=payload, timeout=self._attempt_timeout(deadline), **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = self._retry_delay(attempt, deadline) if connect_failed(e) else None
+                if delay is None:
+                    self.stats.record(time.perf_counter() - started, ok=False, retries=attempt)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            delay = self._retry_delay(attempt, deadline, response) if response.status_code in RETRY_STATUSES else None
+            if delay is not None:
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.stats.record(time.perf_counter() - started, ok=response.status_code == 200, retries=attempt)
+            return response
+
+    def generate_content(self, text):
+        return self.post("generateContent", {"contents": [{"parts": [{"text": text}]}]})
+
+    def ping(self, timeout=5):
+        """HTTP status of the model's metadata (no tokens used, not counted in stats)"""
+        response = self.session.get(f"{self.base_url}/models/{self.model}", params={"key": self.api_key},
+                                    timeout=(self.timeout[0], timeout))
+        response.close()
+        return response.status_code
+
+    def stream_generate_content(self, text):
+        """GeminiStream of the text chunks of streamGenerateContent (SSE), read as Gemini produces them"""
+        return GeminiStream(self, text)
+
+
+class GeminiStream:
+    """Iterates over the text chunks of one streamGenerateContent call.
+
+    finish_reason is Gemini's reason for ending the answer ("STOP" when it
+    is complete; "SAFETY", "MAX_TOKENS" etc. otherwise), or None if the
+    stream broke off before saying.
+    """
+
+    def __init__(self, client, text):
+        self.client = client
+        self.text = text
+        self.finish_reason = None
+
+    def __iter__(self):
+        client = self.client
+        started = time.perf_counter()
+        response = client.post("streamGenerateContent", {"contents": [{"parts": [{"text": self.text}]}]},
+                               stream=True, params_extra={"alt": "sse"})
+        if response.status_code != 200:
+            raise GeminiError(response.status_code, response.text)
+
+        # SSE has no charset parameter and requests would otherwise assume latin-1
+        response.encoding = 'utf-8'
+        first = True
+        with response:
+            # chunk_size=None hands over bytes as they arrive instead of waiting for a full block
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:].strip())
+                for candidate in event.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            if first:
+                                client.first_token_stats.record(time.perf_counter() - started, ok=True)
+                                first = False
+                            yield part["text"]
+                    self.finish_reason = candidate.get("finishReason", self.finish_reason)
+
+
+class AsyncGeminiClient(GeminiRetryMixin):
+    """Same retries and metrics as GeminiClient on top of httpx.AsyncClient.
+
+    Waiting on Gemini only suspends a coroutine, so one event loop can keep
+    hundreds of chat requests in flight. The httpx client is created on
+    first use so it binds to the serving event loop. Streaming chat stays
+    on the WSGI app (/api/chat/stream).
+    """
+
+    def __init__(self, api_key, **kwargs):
+        if httpx is None:
+            raise ImportError("httpx is required for AsyncGeminiClient")
+        super().__init__(api_key, **kwargs)
+        self.session = None
+
+    async def aclose(self):
+        if self.session is not None:
+            await self.session.aclose()
+            self.session = None
+
+    async def post(self, method, payload, params_extra=None):
+        if self.session is None:
+            # Hundreds of concurrent calls share a bounded pool instead of one socket each
+            self.session = httpx.AsyncClient(
+                headers={"Content-Type": "application/json"},
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self.pool_size * 10,
+                                    max_keepalive_connections=self.pool_size))
+
+        started = time.perf_counter()
+        deadline = started + self.total_timeout
+        attempt = 0
+        while True:
+            connect, read = self._attempt_timeout(deadline)
+            try:
+                response = await self.session.post(self.url(method), json=payload,
+                                                   params={"key": self.api_key, **(params_extra or {})},
+                                                   timeout=httpx.Timeout(read, connect=connect))
+            except httpx.TransportError as e:
+                # Only failures to connect are retried; the request may have reached Gemini otherwise
+                connected = not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                delay = None if connected else self._retry_delay(attempt, deadline)
+                if delay is None:
+                    self.stats.record(time.perf_counter() - started, ok=False, retries=attempt)
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            delay = self._retry_delay(attempt, deadline, response) if response.status_code in RETRY_STATUSES else None
+            if delay is not None:
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            self.stats.record(time.perf_counter() - started, ok=response.status_code == 200, retries=attempt)
+            return response
+
+    async def generate_content(self, text):
+        return await self.post("generateContent", {"contents": [{"parts": [{"text": text}]}]})
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Gunicorn settings for the Flask AI/ML server (picked up automatically from this directory)
+
+With PRELOAD_MEDICINE_INDEX=1 (default) the master process loads the medicine
+index before forking, so every worker shares one physical copy: the TF-IDF
+matrix, name index and neighbor table are read-only memory-mapped arrays and
+the remaining Python objects are shared copy-on-write.
+"""
+import os
+import sys
+
+# Gunicorn reads this file before importing the app, so make the app directory importable
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory_stats import format_memory
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = os.getenv('PRELOAD_MEDICINE_INDEX', '1') == '1'
+
+
+def when_ready(server):
+    # Runs in the master after the app module is imported and before workers are forked
+    if preload_app:
+        import app
+        app.preload_services()
+    server.log.info(format_memory("master ready"))
+
+
+def post_worker_init(worker):
+    # OCR processes belong to one worker, so they can only be started after the fork; each
+    # worker gets its share of the host's OCR budget (`--workers` is only known here)
+    import app
+    from ocr_engine import create_ocr_engine
+    app.ocr_engine = create_ocr_engine(processes=worker.cfg.workers)
+    app.ocr_engine.warm_up()
+    # Probe thread per worker; a thread started in the master would not survive the fork
+    app.health_probes.start()
+    # PSS/private show how much of the preloaded data each worker actually shares
+    worker.log.info(format_memory(f"worker {worker.age} started"))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Dependency probes run on a background timer, so health endpoints only read results
+
+Load balancers poll health every few seconds; running OCR or calling
+Gemini on each poll costs more than the traffic being balanced. Each
+probe runs once per interval on a daemon thread and its last outcome and
+latency are kept for /health and /health/ready.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+
+class HealthProbes:
+    """Named checks, each a callable returning a short status string or raising on failure.
+
+    Critical probes gate readiness; the others only report degradation
+    (an Overpass outage should not take every instance out of rotation).
+    """
+
+    def __init__(self, interval=30):
+        self.interval = interval
+        self._probes = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, name, check, critical=False):
+        self._probes[name] = (check, critical)
+
+    def run(self, name):
+        check, critical = self._probes[name]
+        started = time.perf_counter()
+        try:
+            detail, ok = check(), True
+        except Exception as e:
+            detail, ok = str(e), False
+        result = {
+            "ok": ok,
+            "critical": critical,
+            "detail": detail,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "checked_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self._results[name] = result
+        return result
+
+    def run_all(self):
+        for name in self._probes:
+            self.run(name)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_all()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the probe thread (once per process; call after forking)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='health-probes', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def results(self):
+        with self._lock:
+            return {name: dict(result) for name, result in self._results.items()}
+
+    def readiness(self):
+        """('ready' | 'degraded' | 'not_ready' | 'starting', results)"""
+        results = self.results()
+        if len(results) < len(self._probes):
+            return "starting", results
+        if not all(r["ok"] for r in results.values() if r["critical"]):
+            return "not_ready", results
+        if not all(r["ok"] for r in results.values()):
+            return "degraded", results
+        return "ready", results
+
+
+def create_health_probes():
+    """Probes refreshed every HEALTH_PROBE_INTERVAL seconds (default 30)"""
+    return HealthProbes(interval=float(os.getenv('HEALTH_PROBE_INTERVAL', '30')))
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Geohash-bucketed cache of hospital lookups
+
+Query points are snapped to a geohash cell and the hospital set is fetched
+once per cell and radius, from the cell centre with the radius widened by
+the cell's half-diagonal. Every point inside the cell is then answered
+locally by filtering that set on true distance (see app.rank_hospitals).
+"""
+import math
+import os
+import threading
+
+import numpy as np
+
+from response_cache import InProcessBackend
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash_encode(lat, lon, precision=5):
+    """Standard base32 geohash of a point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    bits, bit_count, even = 0, 0, True
+    chars = []
+    while len(chars) < precision:
+        value, bounds = (lon, lon_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash):
+    """(min_lat, min_lon, max_lat, max_lon) of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if even else lat_range
+            mid = (bounds[0] + bounds[1]) / 2
+            if value >> shift & 1:
+                bounds[0] = mid
+            else:
+                bounds[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_km_array(lat, lon, lats, lons):
+    """Distances in kilometres from one point to arrays of points"""
+    phi1, phi2 = np.radians(lat), np.radians(lats)
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class HospitalCache:
+    """Hospital lists per (geohash cell, radius), answered for any point in the cell"""
+
+    def __init__(self, backend, ttl=7 * 24 * 3600, precision=5):
+        self.backend = backend
+        self.ttl = ttl
+        self.precision = precision
+        self._fetch_locks = {}
+        # Name search indexes of cached cells, rebuilt whenever the cell is refetched
+        self._name_indexes = InProcessBackend(backend.max_entries if hasattr(backend, 'max_entries') else 1000)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cell(self, lat, lon, radius):
+        """(key, centre_lat, centre_lon, fetch_radius_m) of the cell containing the point"""
+        geohash = geohash_encode(lat, lon, self.precision)
+        min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+        centre_lat, centre_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+        half_diagonal_m = haversine_km(centre_lat, centre_lon, max_lat, max_lon) * 1000
+        # Rounded up to whole kilometres so equal requests share one Overpass query
+        fetch_radius = int(math.ceil((radius + half_diagonal_m) / 1000) * 1000)
+        return f"{geohash}:{int(radius)}", centre_lat, centre_lon, fetch_radius
+
+    def lookup(self, key):
+        hospitals = self.backend.get(key)
+        if hospitals is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return hospitals
+
+    def store(self, key, hospitals):
+        self.backend.set(key, hospitals, self.ttl)
+
+    def candidates(self, lat, lon, radius, fetch):
+        """Superset of the hospitals within radius of the point (the cached set of its cell),
+        calling fetch(lat, lon, radius) on a cache miss"""
+        key, centre_lat, centre_lon, fetch_radius = self.cell(lat, lon, radius)
+        hospitals = self.lookup(key)
+        if hospitals is None:
+            # One fetch per cell at a time; concurrent requests for it wait and reuse the result
+            with self._lock:
+                fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+            with fetch_lock:
+                hospitals = self.backend.get(key)
+                if hospitals is None:
+                    hospitals = fetch(centre_lat, centre_lon, fetch_radius)
+                    self.store(key, hospitals)
+            with self._lock:
+                self._fetch_locks.pop(key, None)
+        return hospitals
+
+    def searchable(self, lat, lon, radius, fetch, build_index):
+        """(hospitals, name index) of the point's cell; build_index(names) runs once per cached cell"""
+        hospitals = self.candidates(lat, lon, radius, fetch)
+        key = self.cell(lat, lon, radius)[0]
+        entry = self._name_indexes.get(key)
+        if entry is None or entry[0] is not hospitals:
+            entry = (hospitals, build_index([h["name"] for h in hospitals]))
+            self._name_indexes.set(key, entry, self.ttl)
+        return entry
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            "cells": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def create_hospital_cache():
+    """Cache configured from HOSPITAL_CACHE_TTL, HOSPITAL_CACHE_PRECISION and HOSPITAL_CACHE_MAX_CELLS"""
+    return HospitalCache(
+        InProcessBackend(int(os.getenv('HOSPITAL_CACHE_MAX_CELLS', '2000'))),
+        ttl=int(os.getenv('HOSPITAL_CACHE_TTL', str(7 * 24 * 3600))),
+        precision=int(os.getenv('HOSPITAL_CACHE_PRECISION', '5')),
+    )
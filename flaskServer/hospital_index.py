@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Offline hospital index built from an OpenStreetMap extract
+
+The import pulls every amenity=hospital node and way (ways are reduced to
+the centre of their outline) out of an OSM JSON or PBF file and saves them
+to a directory; the server answers radius and k-nearest queries from a
+haversine ball tree over those points instead of calling Overpass.
+
+Usage:
+    python hospital_index.py india-latest.osm.pbf   (needs the `osmium` package)
+    python hospital_index.py hospitals.json         (Overpass/OSM JSON export)
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from hospital_cache import EARTH_RADIUS_KM
+
+try:
+    import osmium  # optional, only needed to import .pbf extracts
+except ImportError:
+    osmium = None
+
+HOSPITAL_INDEX_DIR = os.getenv('HOSPITAL_INDEX_DIR', os.path.join(os.path.dirname(__file__), '.cache', 'hospitals'))
+
+
+def element_location(element, node_locations=None):
+    """(lat, lon) of an Overpass/OSM JSON element, or None if it has no usable position"""
+    if "lat" in element and "lon" in element:
+        return element["lat"], element["lon"]
+    # Ways and relations: `out center`, `out geom`, or node refs resolved from the same file
+    if "center" in element:
+        return element["center"]["lat"], element["center"]["lon"]
+    points = [(p["lat"], p["lon"]) for p in element.get("geometry") or [] if p]
+    if not points and node_locations is not None:
+        points = [node_locations[ref] for ref in element.get("nodes", []) if ref in node_locations]
+    if not points:
+        return None
+    return sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)
+
+
+def read_osm_json(path):
+    """Hospital (name, lat, lon) tuples from an Overpass or OSM JSON file"""
+    with open(path, encoding='utf-8') as f:
+        elements = json.load(f).get("elements", [])
+    node_locations = {e["id"]: (e["lat"], e["lon"]) for e in elements if e.get("type") == "node" and "lat" in e}
+
+    hospitals = []
+    for element in elements:
+        tags = element.get("tags", {})
+        if tags.get("amenity") != "hospital":
+            continue
+        location = element_location(element, node_locations)
+        if location is not None:
+            hospitals.append((tags.get("name", "Unknown Hospital"), *location))
+    return hospitals
+
+
+def read_osm_pbf(path):
+    """Hospital (name, lat, lon) tuples from a PBF extract"""
+    if osmium is None:
+        raise ImportError("Reading .pbf extracts needs the osmium package (pip install osmium)")
+
+    class HospitalHandler(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.hospitals = []
+
+        def node(self, n):
+            if n.tags.get("amenity") == "hospital":
+                self.hospitals.append((n.tags.get("name", "Unknown Hospital"), n.location.lat, n.location.lon))
+
+        def way(self, w):
+            if w.tags.get("amenity") != "hospital":
+                return
+            points = [(node.location.lat, node.location.lon) for node in w.nodes if node.location.valid()]
+            if points:
+                self.hospitals.append((w.tags.get("name", "Unknown Hospital"),
+                                       sum(p[0] for p in points) / len(points),
+                                       sum(p[1] for p in points) / len(points)))
+
+    handler = HospitalHandler()
+    # locations=True keeps node coordinates around so way outlines can be resolved
+    handler.apply_file(path, locations=True)
+    return handler.hospitals
+
+
+class HospitalIndex:
+    """Ball tree over hospital coordinates (haversine metric, radians)"""
+
+    def __init__(self, names, coords):
+        self.names = list(names)
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.tree = BallTree(np.radians(self.coords), metric='haversine')
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_hospitals(cls, hospitals):
+        # Same place imported twice (e.g. node inside its own way) is kept once
+        unique = sorted({(name, round(lat, 6), round(lon, 6)) for name, lat, lon in hospitals})
+        return cls([h[0] for h in unique], [(h[1], h[2]) for h in unique])
+
+    def records(self, rows):
+        return [{"name": self.names[i], "lat": float(self.coords[i, 0]), "lon": float(self.coords[i, 1])}
+                for i in rows]
+
+    def rows_within(self, lat, lon, radius):
+        """Sorted rows of the hospitals within radius metres of the point"""
+        return np.sort(self.tree.query_radius(np.radians([[lat, lon]]), r=radius / 1000 / EARTH_RADIUS_KM)[0])
+
+    def within(self, lat, lon, radius):
+        """Hospitals within radius metres of the point"""
+        return self.records(self.rows_within(lat, lon, radius))
+
+    def nearest(self, lat, lon, k):
+        """The k hospitals closest to the point, nearest first"""
+        _, rows = self.tree.query(np.radians([[lat, lon]]), k=min(k, len(self)))
+        return self.records(rows[0])
+
+    def save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, 'hospital_coords.npy'), self.coords)
+        tmp_path = os.path.join(index_dir, 'hospital_names.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.names, f, ensure_ascii=False)
+        # Names go last so a partially written index is never picked up
+        os.replace(tmp_path, os.path.join(index_dir, 'hospital_names.json'))
+
+    @classmethod
+    def load(cls, index_dir=HOSPITAL_INDEX_DIR):
+        """Saved index, or None if the import hasn't been run"""
+        names_path = os.path.join(index_dir, 'hospital_names.json')
+        if not os.path.exists(names_path):
+            return None
+        try:
+            with open(names_path, encoding='utf-8') as f:
+                names = json.load(f)
+            return cls(names, np.load(os.path.join(index_dir, 'hospital_coords.npy')))
+        except Exception as e:
+            print(f"Could not load hospital index: {e}")
+            return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("extract", help="OSM .pbf or Overpass/OSM .json file")
+    parser.add_argument("--out", default=HOSPITAL_INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.extract.endswith(".pbf"):
+        hospitals = read_osm_pbf(args.extract)
+    else:
+        hospitals = read_osm_json(args.extract)
+    if not hospitals:
+        raise SystemExit(f"No amenity=hospital nodes or ways found in {args.extract}")
+    index = HospitalIndex.from_hospitals(hospitals)
+    index.save(args.out)
+    print(f"Indexed {len(index)} hospitals from {args.extract} into {args.out}")
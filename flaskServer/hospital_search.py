@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Prefix and typo-tolerant name search over hospitals"""
+from bisect import bisect_left
+
+import numpy as np
+from rapidfuzz import fuzz
+from rapidfuzz.process import cdist
+from rapidfuzz.utils import default_process
+
+from medicine_index import NameIndex
+
+
+class HospitalNameIndex:
+    """Sorted word list for prefix lookups plus a trigram index for misspellings.
+
+    Every word of every name is kept in one sorted array, so the names with a
+    word starting with a prefix form a contiguous range found by bisection
+    (what a trie would give, without a node per character). Queries that
+    don't prefix-match are shortlisted by shared trigrams and fuzzy scored.
+    """
+
+    def __init__(self, names, shortlist_size=100):
+        self.names = [str(name) for name in names]
+        self.trigrams = NameIndex(self.names, shortlist_size=shortlist_size, max_df=0.3)
+
+        words = sorted({(word, i) for i, name in enumerate(self.names) for word in default_process(name).split()})
+        self._words = [word for word, _ in words]
+        self._rows = np.array([i for _, i in words], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix_rows(self, prefix):
+        """Rows of the names with a word starting with prefix"""
+        start = bisect_left(self._words, prefix)
+        end = bisect_left(self._words, prefix + '￿')
+        return self._rows[start:end]
+
+    def search(self, query, score_cutoff=70, rows=None):
+        """{row: score} of names matching the query, among rows if given.
+
+        Names where every query word starts one of their words (autocomplete
+        style, "apol hosp" -> "Apollo Hospital") score 100; other names are
+        scored with WRatio and kept above the cutoff. Pass the rows near the
+        user: a name repeated across the country ("Civil Hospital") would
+        otherwise fill the fuzzy shortlist with far-away copies. Without rows
+        only the names sharing the most trigrams are scored.
+        """
+        words = default_process(query).split()
+        if not words:
+            return {}
+
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int32)
+        prefixed = None
+        for word in words:
+            hits = set(self.prefix_rows(word).tolist())
+            prefixed = hits if prefixed is None else prefixed & hits
+        if rows is not None:
+            prefixed &= set(rows.tolist())
+        scores = dict.fromkeys(prefixed, 100)
+
+        # Near the user every name sharing a trigram is scored; a cut by trigram count could drop
+        # the closest of several equally good matches
+        limit = len(rows) if rows is not None and len(rows) else None
+        candidates = [int(i) for i in self.trigrams.shortlist(query, limit=limit, rows=rows) if int(i) not in scores]
+        if candidates:
+            fuzzy = cdist([query], [self.names[i] for i in candidates], scorer=fuzz.WRatio, processor=default_process)[0]
+            for row, score in zip(candidates, fuzzy):
+                if score >= score_cutoff:
+                    scores[row] = int(round(score))
+        return scores
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""On-disk artifacts derived from the medicine dataset
+
+Everything lives in a directory named after the source CSV's content hash,
+so a changed dataset simply gets a new directory and a fresh fit.
+
+Usage (offline, after the dataset changes, also builds the neighbor table):
+    python medicine_cache.py
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+try:
+    import pyarrow  # noqa: F401  (enables Parquet catalog snapshots)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+from medicine_index import NameIndex
+
+CACHE_DIR = os.getenv('MEDICINE_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.cache', 'medicine'))
+
+# Bump when the layout of the cached files changes
+CACHE_FORMAT = "v2"
+
+# Dataset versions of one CSV kept in the cache (the current one included), so workers still
+# running on the previous CSV keep theirs
+KEEP_VERSIONS = int(os.getenv('MEDICINE_CACHE_KEEP', '2'))
+
+# Only these CSV columns are ever used; everything else is never read
+CATALOG_DTYPES = {
+    "name": "category",
+    "manufacturer_name": "category",
+    "price(₹)": "float32",
+    "short_composition1": "category",
+    "short_composition2": "category",
+}
+
+# Neighbors kept per composition; requests needing more fall back to live computation
+NEIGHBOR_COUNT = 32
+
+
+def dataset_version(csv_path):
+    """Short content hash of the source CSV, used to tell stale artifacts apart"""
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def read_medicine_catalog(csv_path):
+    """Typed, columnar catalog: dictionary-encoded strings and float32 prices"""
+    df = pd.read_csv(csv_path, usecols=list(CATALOG_DTYPES), dtype=CATALOG_DTYPES)
+
+    part1 = df["short_composition1"].astype(str).where(df["short_composition1"].notna(), "").str.lower()
+    part2 = df["short_composition2"].astype(str).where(df["short_composition2"].notna(), "").str.lower()
+
+    # Ingredient order and spacing don't matter when grouping alternatives
+    key1 = part1.str.replace(r"\s+", "", regex=True)
+    key2 = part2.str.replace(r"\s+", "", regex=True)
+    composition_key = np.where(key1 <= key2, key1 + "+" + key2, key2 + "+" + key1)
+
+    # Compositions repeat across thousands of brands, so store each string once
+    return pd.DataFrame({
+        "name": df["name"],
+        "manufacturer_name": df["manufacturer_name"],
+        "price(₹)": df["price(₹)"],
+        "full_composition": (part1 + " " + part2).astype("category"),
+        "composition_key": pd.Categorical(composition_key),
+    })
+
+
+def version_dir(version):
+    """Cache directory for one dataset version"""
+    return os.path.join(CACHE_DIR, f"{version}-{CACHE_FORMAT}")
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def top_positions(scores, k):
+    """Positions of the k highest scores, highest first and lower position first on ties.
+
+    A bare argpartition lets the partition algorithm decide which of several
+    rows tied at the cut-off get in; here the lowest positions always do.
+    """
+    if k >= len(scores):
+        top = np.arange(len(scores))
+    else:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > kth)
+        top = np.concatenate((above, np.flatnonzero(scores == kth)[:k - len(above)]))
+    return top[np.lexsort((top, -scores[top]))]
+
+
+class NeighborTable:
+    """Top-K most similar rows for every unique composition string.
+
+    Rows with the same composition have identical similarity vectors, so
+    the table only stores one row of int32 indices and float16 scores per
+    unique composition, plus an int32 composition id per medicine.
+    """
+
+    def __init__(self, codes, neighbors, scores):
+        self.codes = codes
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @classmethod
+    def build(cls, tfidf_matrix, compositions, top_k=NEIGHBOR_COUNT, chunk_size=64):
+        """Compute the table from the TF-IDF matrix (rows are L2-normalized)"""
+        _, first_rows, codes = np.unique(np.asarray(compositions, dtype=object),
+                                         return_index=True, return_inverse=True)
+        matrix = tfidf_matrix.astype(np.float32).tocsr()
+        width = min(top_k + 1, matrix.shape[0])
+        neighbors = np.empty((len(first_rows), width), dtype=np.int32)
+        scores = np.empty((len(first_rows), width), dtype=np.float16)
+
+        for start in range(0, len(first_rows), chunk_size):
+            rows = first_rows[start:start + chunk_size]
+            sims = (matrix[rows] @ matrix.T).toarray()
+            # Highest score first, lower row index first on ties (the order of ranked_candidates in app.py)
+            for i in range(len(rows)):
+                top = top_positions(sims[i], width)
+                neighbors[start + i] = top
+                scores[start + i] = sims[i][top]
+
+        return cls(codes.astype(np.int32).ravel(), neighbors, scores)
+
+    def save(self, cache_dir, version):
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(os.path.join(cache_dir, 'composition_codes.npy'), self.codes)
+        np.save(os.path.join(cache_dir, 'neighbor_indices.npy'), self.neighbors)
+        np.save(os.path.join(cache_dir, 'neighbor_scores.npy'), self.scores)
+        # Metadata goes last so a partially written table is never picked up
+        _write_json(os.path.join(cache_dir, 'neighbors.json'),
+                    {"version": version, "rows": len(self.codes), "top_k": self.neighbors.shape[1] - 1})
+
+    @classmethod
+    def load(cls, cache_dir, version, rows):
+        """Memory-map a saved table, or None if it is missing or built from other data"""
+        try:
+            with open(os.path.join(cache_dir, 'neighbors.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("version") != version or meta.get("rows") != rows:
+                print("Neighbor table is stale, falling back to live similarity")
+                return None
+            return cls(
+                np.load(os.path.join(cache_dir, 'composition_codes.npy'), mmap_mode='r'),
+                np.load(os.path.join(cache_dir, 'neighbor_indices.npy'), mmap_mode='r'),
+                np.load(os.path.join(cache_dir, 'neighbor_scores.npy'), mmap_mode='r'),
+            )
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Could not load neighbor table: {e}")
+            return None
+
+    def candidates(self, idx):
+        """Most similar rows for row idx, best first (may include idx itself)"""
+        return self.neighbors[self.codes[idx]]
+
+
+def save_medicine_artifacts(cache_dir, catalog, tfidf, tfidf_matrix, name_index, source=None):
+    """Persist the slim catalog, fitted vectorizer, CSR matrix and name index (built from the
+    CSV at `source`, recorded for prune_medicine_caches)"""
+    tmp_dir = f"{cache_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        if PARQUET_AVAILABLE:
+            catalog.to_parquet(os.path.join(tmp_dir, 'catalog.parquet'), index=False)
+        else:
+            catalog.to_pickle(os.path.join(tmp_dir, 'catalog.pkl'))
+
+        _write_json(os.path.join(tmp_dir, 'tfidf_vocabulary.json'),
+                    {term: int(i) for term, i in tfidf.vocabulary_.items()})
+        np.save(os.path.join(tmp_dir, 'tfidf_idf.npy'), tfidf.idf_)
+
+        # CSR components are stored separately so they can be memory-mapped
+        matrix = tfidf_matrix.tocsr().astype(np.float32)
+        np.save(os.path.join(tmp_dir, 'tfidf_data.npy'), matrix.data)
+        np.save(os.path.join(tmp_dir, 'tfidf_indices.npy'), matrix.indices)
+        np.save(os.path.join(tmp_dir, 'tfidf_indptr.npy'), matrix.indptr)
+
+        gram_ids, doc_ids, offsets, lengths = name_index.postings
+        _write_json(os.path.join(tmp_dir, 'name_trigrams.json'), gram_ids)
+        np.save(os.path.join(tmp_dir, 'name_doc_ids.npy'), doc_ids)
+        np.save(os.path.join(tmp_dir, 'name_offsets.npy'), offsets)
+        np.save(os.path.join(tmp_dir, 'name_lengths.npy'), lengths)
+
+        _write_json(os.path.join(tmp_dir, 'artifacts.json'),
+                    {"rows": len(catalog), "shape": list(matrix.shape),
+                     "source": os.path.abspath(source) if source else None})
+
+        # Another worker may have finished first; either copy is fine
+        os.replace(tmp_dir, cache_dir)
+    except OSError:
+        if not os.path.isdir(cache_dir):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _artifacts_source(path):
+    try:
+        with open(os.path.join(path, 'artifacts.json'), encoding='utf-8') as f:
+            return json.load(f).get("source")
+    except (OSError, ValueError):
+        return None
+
+
+def prune_medicine_caches(cache_dir, source, keep=KEEP_VERSIONS):
+    """Delete caches of the same CSV that are no longer needed: older layouts of this
+    dataset version, and all but the `keep` newest versions. Caches built from other CSVs
+    (a MEDICINE_CACHE_DIR shared between deployments) are left alone."""
+    parent = os.path.dirname(cache_dir)
+    version, cache_format = os.path.basename(cache_dir).rsplit('-', 1)
+    source = os.path.abspath(source)
+    older_versions = []
+    for entry in os.listdir(parent):
+        path = os.path.join(parent, entry)
+        if path == cache_dir or not os.path.isdir(path) or '.tmp-' in entry or '-' not in entry:
+            continue
+        entry_version, entry_format = entry.rsplit('-', 1)
+        if entry_version == version:
+            # Same CSV content; only a layout this code has superseded is removed
+            if entry_format[1:].isdigit() and int(entry_format[1:]) < int(cache_format[1:]):
+                shutil.rmtree(path, ignore_errors=True)
+        elif _artifacts_source(path) == source:
+            older_versions.append(path)
+
+    older_versions.sort(key=os.path.getmtime, reverse=True)
+    for path in older_versions[max(keep - 1, 0):]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def load_medicine_artifacts(cache_dir, tfidf):
+    """(catalog, tfidf, tfidf_matrix, name_index) from the cache, or None if not built yet.
+
+    `tfidf` is an unfitted vectorizer configured like the one used for the fit;
+    its vocabulary and idf weights are restored in place.
+    """
+    meta_path = os.path.join(cache_dir, 'artifacts.json')
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+
+        def mapped(name):
+            return np.load(os.path.join(cache_dir, name), mmap_mode='r')
+
+        parquet_path = os.path.join(cache_dir, 'catalog.parquet')
+        if os.path.exists(parquet_path):
+            catalog = pd.read_parquet(parquet_path)
+        else:
+            catalog = pd.read_pickle(os.path.join(cache_dir, 'catalog.pkl'))
+
+        with open(os.path.join(cache_dir, 'tfidf_vocabulary.json'), encoding='utf-8') as f:
+            tfidf.vocabulary_ = json.load(f)
+        tfidf.idf_ = np.load(os.path.join(cache_dir, 'tfidf_idf.npy'))
+
+        tfidf_matrix = sparse.csr_matrix(
+            (mapped('tfidf_data.npy'), mapped('tfidf_indices.npy'), mapped('tfidf_indptr.npy')),
+            shape=tuple(meta["shape"]), copy=False)
+
+        with open(os.path.join(cache_dir, 'name_trigrams.json'), encoding='utf-8') as f:
+            gram_ids = json.load(f)
+        name_index = NameIndex(catalog["name"], postings=(
+            gram_ids, mapped('name_doc_ids.npy'), mapped('name_offsets.npy'), mapped('name_lengths.npy')))
+
+        return catalog, tfidf, tfidf_matrix, name_index
+    except Exception as e:
+        print(f"Could not load cached medicine artifacts, refitting: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import app
+
+    if not app.load_medicine_data():
+        raise SystemExit(1)
+    version = dataset_version(app.MEDICINE_CSV_PATH)
+    table = NeighborTable.build(app.tfidf_matrix, app.medicine_df["full_composition"])
+    table.save(version_dir(version), version)
+    print(f"Saved neighbor table for {len(table.neighbors)} compositions ({version}) to {version_dir(version)}")
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Trigram name index used to shortlist medicine names before fuzzy scoring"""
+from array import array
+
+import numpy as np
+from rapidfuzz import fuzz
+from rapidfuzz.process import cdist
+from rapidfuzz.utils import default_process
+from thefuzz import process, utils
+
+
+def _trigrams(text):
+    """Character trigrams of an already processed string, padded at the edges"""
+    if not text:
+        return set()
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Inverted character-trigram index over medicine names.
+
+    A query only scores the few hundred names that share the most trigrams
+    with it instead of running thefuzz over the whole dataset.
+    """
+
+    def __init__(self, names, shortlist_size=200, max_df=0.2, postings=None):
+        self.names = [str(name) for name in names]
+        self.shortlist_size = shortlist_size
+        self.max_df = max_df
+
+        # First row for every name, matching medicine_df[medicine_df["name"] == name].index[0]
+        self._positions = {}
+        for i, name in enumerate(self.names):
+            self._positions.setdefault(name, i)
+
+        if postings is None:
+            postings = self._build_postings(self.names)
+        self._gram_ids, self._doc_ids, self._offsets, self._lengths = postings
+
+    @staticmethod
+    def _build_postings(names):
+        gram_ids = {}
+        gram_col = array('i')
+        doc_col = array('i')
+        lengths = np.zeros(len(names), dtype=np.int32)
+        for i, name in enumerate(names):
+            grams = _trigrams(utils.full_process(name))
+            lengths[i] = len(grams)
+            for gram in grams:
+                gram_col.append(gram_ids.setdefault(gram, len(gram_ids)))
+                doc_col.append(i)
+
+        # Store postings as one CSR-style pair of arrays: doc ids grouped by trigram
+        grams = np.frombuffer(gram_col, dtype=np.int32)
+        docs = np.frombuffer(doc_col, dtype=np.int32)
+        order = np.argsort(grams, kind="stable")
+        offsets = np.zeros(len(gram_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grams, minlength=len(gram_ids)), out=offsets[1:])
+        return gram_ids, docs[order], offsets, lengths
+
+    @property
+    def postings(self):
+        """(trigram ids, doc ids, offsets, name lengths), enough to rebuild the index without re-tokenizing"""
+        return self._gram_ids, self._doc_ids, self._offsets, self._lengths
+
+    def __len__(self):
+        return len(self.names)
+
+    def position(self, name):
+        """Row index of the first occurrence of an exact name"""
+        return self._positions.get(name)
+
+    def shortlist(self, query, limit=None, rows=None):
+        """Indices of the names sharing the most trigrams with the query (among rows, if given)"""
+        limit = limit or self.shortlist_size
+        ids = [self._gram_ids[g] for g in _trigrams(utils.full_process(query)) if g in self._gram_ids]
+        if not ids:
+            # No name shares a single trigram with the query
+            return np.empty(0, dtype=np.int32)
+
+        # Very common trigrams ("tab", "let") carry little signal; skip them if rarer ones exist
+        sizes = self._offsets[np.asarray(ids) + 1] - self._offsets[ids]
+        rare = [g for g, size in zip(ids, sizes) if size <= self.max_df * len(self.names)]
+        ids = rare or ids
+
+        hits = np.concatenate([self._doc_ids[self._offsets[g]:self._offsets[g + 1]] for g in ids])
+        if rows is not None:
+            hits = hits[np.isin(hits, rows)]
+        candidates, counts = np.unique(hits, return_counts=True)
+        if len(candidates) > limit:
+            # Rank by shared trigrams, earliest row first on ties, so the rows a full scan
+            # would prefer among equal scores are the ones kept
+            rank = counts.astype(np.int64) * (len(self.names) + 1) - candidates
+            candidates = candidates[np.argpartition(-rank, limit - 1)[:limit]]
+
+        # Dataset order, so extractOne resolves score ties to the earliest shortlisted row
+        return np.sort(candidates)
+
+    def match(self, query, score_cutoff=70):
+        """Best (name, score, index) for the query, or None if the score is not above the cutoff.
+
+        Ties go to the earliest shortlisted row. That is not always the row a
+        full extractOne scan would pick: an earlier name with the same score
+        but fewer shared trigrams can fall outside the shortlist.
+        """
+        if not utils.full_process(query):
+            return None
+
+        candidates = self.shortlist(query)
+        if not len(candidates):
+            return None
+
+        result = process.extractOne(query, {int(i): self.names[i] for i in candidates})
+        if result and result[1] > score_cutoff:
+            return result[0], result[1], result[2]
+        return None
+
+    def match_phrases(self, phrases, score_cutoff=60, stop_score=98, batch_size=32, per_phrase=50):
+        """Best (name, score, index) over many phrases, scored in batched score matrices.
+
+        Phrases are deduplicated, each batch is scored against the union of the
+        phrase shortlists in one cdist call, and matching stops as soon as a
+        near-perfect score is found.
+        """
+        unique = list(dict.fromkeys(p for p in phrases if utils.full_process(p)))
+        best_score, best_index = 0, None
+
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start:start + batch_size]
+            shortlists = [self.shortlist(phrase, limit=per_phrase) for phrase in batch]
+            candidates = np.unique(np.concatenate(shortlists))
+            if not len(candidates):
+                continue
+
+            scores = cdist(batch, [self.names[i] for i in candidates],
+                           scorer=fuzz.WRatio, processor=default_process, workers=-1)
+            scores = np.rint(scores)
+            # Row-major argmax keeps the earliest phrase and earliest row on ties
+            flat = int(np.argmax(scores))
+            score = int(scores.flat[flat])
+            if score > best_score:
+                best_score, best_index = score, int(candidates[flat % len(candidates)])
+            if best_score >= stop_score:
+                break
+
+        if best_index is not None and best_score > score_cutoff:
+            return self.names[best_index], best_score, best_index
+        return None
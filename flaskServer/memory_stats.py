@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Resident memory of the current process, used for startup reports"""
+import os
+import sys
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+
+def memory_usage():
+    """RSS plus, on Linux, PSS (shared pages split between processes) and private memory, in MB"""
+    stats = {}
+    try:
+        # smaps_rollup separates pages shared with the gunicorn master from private ones
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                    stats[key] = int(value.split()[0]) / 1024
+        return {
+            "rss_mb": round(stats.get('Rss', 0), 1),
+            "pss_mb": round(stats.get('Pss', 0), 1),
+            "private_mb": round(stats.get('Private_Clean', 0) + stats.get('Private_Dirty', 0), 1),
+        }
+    except OSError:
+        pass
+    if resource is not None:
+        # Peak RSS only; ru_maxrss is bytes on macOS and KB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss_mb": round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)}
+    try:
+        import psutil  # optional, e.g. on Windows
+        return {"rss_mb": round(psutil.Process().memory_info().rss / (1024 * 1024), 1)}
+    except ImportError:
+        return {}
+
+
+def format_memory(label):
+    usage = memory_usage()
+    return f"[MEM] pid={os.getpid()} {label}: " + (", ".join(f"{k}={v}" for k, v in usage.items()) or "n/a")
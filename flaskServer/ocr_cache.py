@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Cache of image-recommendation results keyed on the uploaded photo
+
+A byte-identical upload (a retry, or the same file picked again) is found
+by its SHA-256 before anything is decoded. Re-encoded copies of the same
+photo (the browser recompressing or resizing it) are found through a
+32x32 grayscale fingerprint, decoded at reduced size: two uploads match
+when almost every fingerprint pixel agrees. A difference hash (dHash) was
+tried first, but under it photos of different strips shot the same way
+came closer than re-encodes of one photo, and a wrong medicine is worse
+than a cache miss.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from response_cache import InProcessBackend
+
+Fingerprint = namedtuple('Fingerprint', ['digest', 'aspect', 'thumbnail'])
+
+THUMBNAIL_SIZE = 32
+
+# Only outcomes that depend on the image alone; 429s, 503s (medicine index not loaded yet)
+# and server errors are retried for real
+CACHEABLE_STATUSES = (200, 400, 404)
+
+
+def thumbnail(image_data, size=THUMBNAIL_SIZE):
+    """(aspect ratio, size x size float32 thumbnail scaled to zero mean and unit variance), or
+    (None, None) if the image can't be decoded or is nearly featureless"""
+    try:
+        width, height = Image.open(io.BytesIO(image_data)).size  # header only
+    except Exception:
+        return None, None
+    flag = cv2.IMREAD_GRAYSCALE
+    for factor, reduced in ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                            (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+        if min(width, height) // factor >= 2 * size:
+            flag = reduced
+            break
+    gray = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flag)
+    if gray is None:
+        return None, None
+    pixels = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    # Blank or uniform photos all look alike
+    if pixels.std() < 8:
+        return None, None
+    return width / height, (pixels - pixels.mean()) / pixels.std()
+
+
+class OCRResultCache:
+    """(status, payload) of recommend_image per upload, in a size-bounded LRU with TTL.
+
+    Uploads match a cached one if the aspect ratios agree within 2% and at
+    most max_changed of the fingerprint pixels differ by more than tolerance
+    (in standard deviations).
+    """
+
+    def __init__(self, max_entries=500, ttl=24 * 3600, tolerance=0.25, max_changed=0.01):
+        self.results = InProcessBackend(max_entries)
+        self.ttl = ttl
+        self.tolerance = tolerance
+        self.max_changed = max_changed
+        self._fingerprints = OrderedDict()
+        self._compute_locks = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def _similar(self, fingerprint):
+        """Digest of a cached upload that looks the same, or None"""
+        with self._lock:
+            candidates = [(digest, aspect, thumb) for digest, (aspect, thumb) in self._fingerprints.items()
+                          if abs(aspect / fingerprint.aspect - 1) <= 0.02]
+        if not candidates:
+            return None
+        changed = (np.abs(np.stack([thumb for _, _, thumb in candidates]) - fingerprint.thumbnail)
+                   > self.tolerance).mean(axis=(1, 2))
+        best = int(np.argmin(changed))
+        return candidates[best][0] if changed[best] <= self.max_changed else None
+
+    def lookup(self, image_data):
+        """((status, payload) or None, 'exact'/'similar'/None, fingerprint to store the result under)"""
+        digest = hashlib.sha256(image_data).hexdigest()
+        result = self.results.get(digest)
+        if result is not None:
+            self.exact_hits += 1
+            return result, 'exact', Fingerprint(digest, None, None)
+
+        fingerprint = Fingerprint(digest, *thumbnail(image_data))
+        if fingerprint.thumbnail is not None:
+            similar = self._similar(fingerprint)
+            result = self.results.get(similar) if similar is not None else None
+            if result is not None:
+                self.similar_hits += 1
+                return result, 'similar', fingerprint
+            if similar is not None:
+                # Result expired or evicted
+                with self._lock:
+                    self._fingerprints.pop(similar, None)
+        self.misses += 1
+        return None, None, fingerprint
+
+    def store(self, fingerprint, status, payload):
+        if status not in CACHEABLE_STATUSES:
+            return
+        self.results.set(fingerprint.digest, (status, payload), self.ttl)
+        if fingerprint.thumbnail is None:
+            return
+        with self._lock:
+            self._fingerprints[fingerprint.digest] = (fingerprint.aspect, fingerprint.thumbnail)
+            self._fingerprints.move_to_end(fingerprint.digest)
+            while len(self._fingerprints) > self.results.max_entries:
+                self._fingerprints.popitem(last=False)
+
+    def get_or_compute(self, image_data, compute):
+        """((status, payload), 'exact'/'similar'/None); compute(image_data) -> (status, payload)
+        runs on a miss, once at a time per upload so retries wait for the first request"""
+        result, match, fingerprint = self.lookup(image_data)
+        if result is not None:
+            return result, match
+
+        with self._lock:
+            compute_lock = self._compute_locks.setdefault(fingerprint.digest, threading.Lock())
+        try:
+            with compute_lock:
+                result = self.results.get(fingerprint.digest)
+                if result is not None:
+                    return result, 'exact'
+                result = compute(image_data)
+                self.store(fingerprint, *result)
+                return result, None
+        finally:
+            with self._lock:
+                self._compute_locks.pop(fingerprint.digest, None)
+
+    def snapshot(self):
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self.results),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 3) if lookups else None,
+        }
+
+
+def create_ocr_result_cache():
+    """Cache configured from OCR_CACHE_MAX_ENTRIES and OCR_CACHE_TTL"""
+    return OCRResultCache(max_entries=int(os.getenv('OCR_CACHE_MAX_ENTRIES', '500')),
+                          ttl=int(os.getenv('OCR_CACHE_TTL', str(24 * 3600))))
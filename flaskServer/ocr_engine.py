@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""Tesseract OCR on long-lived workers, with the fallback configurations run side by side
+
+The medicine-strip reader tries a few page segmentation setups, falling
+back to the next when one reads nothing. With tesserocr installed, each
+worker process keeps one Tesseract API (language model loaded once) for
+its lifetime; otherwise every run is a pytesseract subprocess, which
+reloads the model each time. When there are idle workers the fallbacks
+start together with the first setup, and the first result in priority
+order that read any text wins.
+
+Requests beyond the workers plus a bounded queue are refused (OCRBusy,
+a 429 for clients) instead of piling up behind a saturated CPU.
+"""
+import os
+import shlex
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# tesseract starts an OpenMP thread per core by default, which only oversubscribes the CPU
+# when several runs go in parallel (set before the library is loaded, inherited by subprocesses)
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+import pytesseract
+
+from gemini_client import LatencyStats
+
+try:
+    import tesserocr  # optional: keeps Tesseract loaded in the worker processes
+except ImportError:
+    tesserocr = None
+
+# Tried in this order; the first non-empty result wins
+OCR_CONFIGS = (
+    ('whitelist', r'--oem 3 --psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 '),
+    ('default', ''),
+    ('single_word', '--psm 8'),
+)
+
+
+class OCRBusy(Exception):
+    """Every OCR worker is busy and the queue is full"""
+
+
+def parse_config(config):
+    """(page segmentation mode, {variable: value}) of a tesseract command line config"""
+    psm, variables = 3, {}
+    args = shlex.split(config)
+    for i, arg in enumerate(args[:-1]):
+        if arg == '--psm':
+            psm = int(args[i + 1])
+        elif arg == '-c':
+            name, _, value = args[i + 1].partition('=')
+            variables[name] = value
+    return psm, variables
+
+
+# One Tesseract API per worker process, created by the pool initializer
+_api = None
+# Defaults of the variables the current configuration changed, restored before the next run
+_changed = {}
+
+
+def _start_worker(lang):
+    global _api
+    _api = tesserocr.PyTessBaseAPI(lang=lang)  # tessdata from TESSDATA_PREFIX
+
+
+def _recognize_in_worker(image, config):
+    """(text, seconds) of one run on this process's API"""
+    started = time.perf_counter()
+    psm, variables = parse_config(config)
+    for name in [name for name in _changed if name not in variables]:
+        _api.SetVariable(name, _changed.pop(name))
+    for name, value in variables.items():
+        _changed.setdefault(name, _api.GetVariableAsString(name))
+        _api.SetVariable(name, value)
+    _api.SetPageSegMode(psm)
+    _api.SetImage(image)
+    text = _api.GetUTF8Text()
+    _api.Clear()
+    return text, time.perf_counter() - started
+
+
+def _recognize_with_subprocess(path, config):
+    """(text, seconds) of one tesseract subprocess run on an image file"""
+    started = time.perf_counter()
+    text = pytesseract.image_to_string(path, config=config)
+    return text, time.perf_counter() - started
+
+
+class OCREngine:
+    """Runs OCR_CONFIGS on a bounded pool of Tesseract workers.
+
+    workers bounds how many runs go at once across all requests, and
+    queue_size how many more requests may wait for one. Fallbacks are
+    started speculatively only while workers are idle; under load (or on a
+    single core) they run only after the setup before them read nothing,
+    so parallelism never costs throughput.
+    """
+
+    def __init__(self, configs=OCR_CONFIGS, workers=None, queue_size=None, backend=None, lang='eng'):
+        self.configs = tuple(configs)
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 4 if queue_size is None else queue_size
+        self.lang = lang
+        self.backend = backend or self.default_backend(lang)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self.speculative_runs = 0
+        self.rejected = 0
+        # Per configuration run time (in the worker) and per request time (queueing included)
+        self.stats = {name: LatencyStats() for name, _ in self.configs}
+        self.request_stats = LatencyStats()
+
+    @staticmethod
+    def default_backend(lang):
+        # tesserocr without the language's traineddata would fail in every worker it starts
+        if tesserocr is not None and lang in tesserocr.get_languages()[1]:
+            return 'tesserocr'
+        return 'pytesseract'
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # Created lazily so gunicorn forks its workers before any OCR processes exist
+                if self.backend == 'tesserocr':
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_start_worker,
+                                                     initargs=(self.lang,))
+                else:
+                    # Each run is a tesseract subprocess, so threads only wait on it
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ocr')
+            return self._pool
+
+    def _reset_pool(self, pool):
+        # A worker process died (e.g. Tesseract crashed); the next run starts a fresh pool
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, source, name, config, speculative=False):
+        with self._lock:
+            if speculative:
+                # Only onto a worker nothing else is waiting for
+                if self._outstanding >= self.workers:
+                    return None
+                self.speculative_runs += 1
+            self._outstanding += 1
+        recognize = _recognize_in_worker if self.backend == 'tesserocr' else _recognize_with_subprocess
+        submitted = time.perf_counter()
+        pool = self._get_pool()
+        try:
+            try:
+                future = pool.submit(recognize, source, config)
+            except (BrokenProcessPool, RuntimeError):
+                self._reset_pool(pool)
+                future = self._get_pool().submit(recognize, source, config)
+        except Exception:
+            with self._lock:
+                self._outstanding -= 1
+            raise
+        future.add_done_callback(lambda f: self._finished(name, submitted, f))
+        return future
+
+    def _finished(self, name, submitted, future):
+        with self._lock:
+            self._outstanding -= 1
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.stats[name].record(time.perf_counter() - submitted, False)
+        else:
+            self.stats[name].record(future.result()[1], True)
+
+    def extract_text(self, image):
+        """Text of the first configuration (in priority order) that read anything, or ''.
+
+        Raises OCRBusy when the queue is full, or the highest-priority error
+        (e.g. TesseractNotFoundError) if no configuration read text and at
+        least one failed.
+        """
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise OCRBusy(f"All {self.workers} OCR workers are busy and the queue of {self.queue_size} is full")
+        started = time.perf_counter()
+        ok = False
+        try:
+            text = self._extract(image)
+            ok = True
+            return text
+        finally:
+            self._slots.release()
+            self.request_stats.record(time.perf_counter() - started, ok)
+
+    def _extract(self, image):
+        path = None
+        if self.backend == 'tesserocr':
+            source = image
+        else:
+            # Encoded once and read by every tesseract run
+            fd, path = tempfile.mkstemp(prefix='ocr_', suffix='.png')
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, format='PNG')
+            source = path
+
+        pool = self._get_pool()
+        (first_name, first_config), fallbacks = self.configs[0], self.configs[1:]
+        futures = [self._submit(source, first_name, first_config)]
+        futures += [self._submit(source, name, config, speculative=True) for name, config in fallbacks]
+
+        error = None
+        try:
+            for i, (name, config) in enumerate(self.configs):
+                if futures[i] is None:
+                    futures[i] = self._submit(source, name, config)
+                try:
+                    text = futures[i].result()[0].strip()
+                except BrokenProcessPool as e:
+                    self._reset_pool(pool)
+                    error = error or e
+                    continue
+                except Exception as e:
+                    error = error or e
+                    continue
+                if text:
+                    return text
+        finally:
+            # Speculative runs that haven't started are dropped; running ones finish in the background
+            started = [future for future in futures if future is not None]
+            for future in started:
+                future.cancel()
+            if path is not None:
+                self._remove_when_done(path, started)
+        if error is not None:
+            raise error
+        return ''
+
+    @staticmethod
+    def _remove_when_done(path, futures):
+        # The image file stays until the last tesseract run using it has exited
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        for future in futures:
+            future.add_done_callback(done)
+
+    def warm_up(self):
+        """Start every worker (loading the language model) ahead of the first upload"""
+        from PIL import Image
+        blank = Image.new('L', (64, 32), 255)
+        pool = self._get_pool()
+        if self.backend != 'tesserocr':
+            return
+        try:
+            # Processes load the model in their initializer; one blank run each waits until they're up
+            for future in [pool.submit(_recognize_in_worker, blank, '') for _ in range(self.workers)]:
+                future.result()
+        except Exception as e:
+            print(f"OCR worker warm-up failed: {e}")
+            self._reset_pool(pool)
+
+    def snapshot(self):
+        with self._lock:
+            outstanding = self._outstanding
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": outstanding,
+            "rejected": self.rejected,
+            "speculative_runs": self.speculative_runs,
+            "requests": self.request_stats.snapshot(),
+            "configs": {name: stats.snapshot() for name, stats in self.stats.items()},
+        }
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_ocr_engine(processes=None):
+    """Engine with this process's share of the host's OCR budget.
+
+    OCR_WORKERS (Tesseract runs at once, default one per core) and
+    OCR_QUEUE_SIZE are totals for the host, split evenly over the `processes`
+    server processes (default WEB_CONCURRENCY, else 1) so N gunicorn workers
+    don't start N times the cores. OCR_BACKEND picks 'tesserocr' or
+    'pytesseract' (default tesserocr when installed).
+    """
+    processes = max(1, processes or int(os.getenv('WEB_CONCURRENCY', '1')))
+    workers = int(os.getenv('OCR_WORKERS') or os.cpu_count() or 1)
+    queue_size = os.getenv('OCR_QUEUE_SIZE')
+    return OCREngine(workers=max(1, workers // processes),
+                     queue_size=int(queue_size) // processes if queue_size else None,
+                     backend=os.getenv('OCR_BACKEND') or None)
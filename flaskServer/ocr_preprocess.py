@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Image preprocessing ahead of OCR, sized so Tesseract's work per upload is bounded
+
+Phone photos of medicine strips arrive at 12 MP and more, while Tesseract
+reads printed names best at a few hundred pixels of text height and its
+run time grows with the pixel count. Uploads are decoded straight to a
+reduced grayscale image where the format allows it, scaled to a fixed
+pixel budget, binarized with a local threshold (foil glare and shadows
+defeat a global one), deskewed and cropped to the text.
+"""
+import io
+import math
+import os
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from gemini_client import LatencyStats
+
+STAGES = ('decode', 'resize', 'binarize', 'deskew', 'crop')
+
+# cv2 can decode JPEGs at 1/2, 1/4 or 1/8 size without building the full image first
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                  (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+
+
+class OCRPreprocessor:
+    """Turns uploaded image bytes into a binarized, upright, cropped image for Tesseract.
+
+    max_side caps the longer side (downscaling huge photos); images whose
+    shorter side is under min_side are upscaled, as small text is read
+    poorly. Lines tilted beyond +-max_skew degrees are ignored when
+    estimating the skew, as they are more likely vertical print or noise.
+    """
+
+    def __init__(self, max_side=2000, min_side=300, max_skew=15.0, padding=16):
+        self.max_side = max_side
+        self.min_side = min_side
+        self.max_skew = max_skew
+        self.padding = padding
+        self.stats = {stage: LatencyStats() for stage in STAGES}
+
+    def decode(self, image_data):
+        """Grayscale uint8 array of the upload, decoded at the smallest size still above max_side"""
+        width, height = Image.open(io.BytesIO(image_data)).size  # header only
+        buffer = np.frombuffer(image_data, dtype=np.uint8)
+        for factor, flag in _REDUCED_FLAGS:
+            if max(width, height) // factor >= self.max_side:
+                gray = cv2.imdecode(buffer, flag)
+                if gray is not None:
+                    return gray
+                break
+        gray = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            # Formats OpenCV can't read (GIF, some TIFFs) go through PIL
+            gray = np.asarray(Image.open(io.BytesIO(image_data)).convert('L'))
+        return gray
+
+    def resize(self, gray):
+        height, width = gray.shape
+        scale = 1.0
+        if min(width, height) < self.min_side:
+            scale = self.min_side / min(width, height)
+        scale = min(scale, self.max_side / max(width, height))
+        if abs(scale - 1.0) < 0.01:
+            return gray
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+
+    @staticmethod
+    def binarize(gray):
+        """Black text on white, thresholded against each pixel's neighbourhood"""
+        # Neighbourhood of a twelfth of the shorter side: wider than the strokes of upscaled
+        # small text (a narrower one hollows them out), local enough for uneven lighting
+        block = max(15, min(gray.shape) // 12) | 1
+        binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block, 15)
+        # Light print on a dark strip comes out mostly black; flip it
+        if cv2.countNonZero(binary) < binary.size / 2:
+            binary = cv2.bitwise_not(binary)
+        return binary
+
+    @staticmethod
+    def text_blobs(binary):
+        """Mask of the ink merged into word/line blobs; specks, frame-sized blobs and hollow
+        outlines (strip or card edges) are left out"""
+        height, width = binary.shape
+        ink = cv2.bitwise_not(binary)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, width // 60), 3))
+        blobs = cv2.dilate(ink, kernel)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(blobs, connectivity=8)
+        areas = stats[:, cv2.CC_STAT_AREA]
+        widths, heights = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+        kept = ((areas >= binary.size * 0.0005)
+                & (areas >= 0.3 * widths * heights)
+                & ~((widths > 0.95 * width) & (heights > 0.95 * height)))
+        kept[0] = False  # background
+        return kept[labels].astype(np.uint8) * 255
+
+    def deskew(self, binary):
+        """Rotated so the text lines are level; the skew is the length-weighted median of the
+        line blobs' angles"""
+        contours, _ = cv2.findContours(self.text_blobs(binary), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        angles, weights = [], []
+        for contour in contours:
+            (_, _), (w, h), angle = cv2.minAreaRect(contour)
+            if max(w, h) < 2 * min(w, h):
+                continue  # not line-shaped
+            # Direction of the long side, in (-90, 90] whatever range this OpenCV reports angles in
+            angle = ((angle if w >= h else angle + 90) + 90) % 180 - 90
+            if abs(angle) <= self.max_skew:
+                angles.append(angle)
+                weights.append(max(w, h))
+        if not angles:
+            return binary
+        order = np.argsort(angles)
+        cumulative = np.cumsum(np.asarray(weights)[order])
+        angle = float(np.asarray(angles)[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+        if abs(angle) < 0.5:
+            return binary
+
+        height, width = binary.shape
+        radians = math.radians(angle)
+        new_width = int(width * abs(math.cos(radians)) + height * abs(math.sin(radians)))
+        new_height = int(width * abs(math.sin(radians)) + height * abs(math.cos(radians)))
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        matrix[0, 2] += (new_width - width) / 2
+        matrix[1, 2] += (new_height - height) / 2
+        return cv2.warpAffine(binary, matrix, (new_width, new_height), flags=cv2.INTER_NEAREST,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+    def crop(self, binary):
+        points = cv2.findNonZero(self.text_blobs(binary))
+        if points is None:
+            return binary
+        x, y, w, h = cv2.boundingRect(points)
+        height, width = binary.shape
+        x0, y0 = max(0, x - self.padding), max(0, y - self.padding)
+        x1, y1 = min(width, x + w + self.padding), min(height, y + h + self.padding)
+        return binary[y0:y1, x0:x1]
+
+    def run(self, image_data):
+        """(PIL grayscale image ready for OCR, {stage: milliseconds})"""
+        timings = {}
+        result = image_data
+        for stage in STAGES:
+            started = time.perf_counter()
+            result = getattr(self, stage)(result)
+            elapsed = time.perf_counter() - started
+            self.stats[stage].record(elapsed, True)
+            timings[stage] = round(elapsed * 1000, 2)
+        return Image.fromarray(result), timings
+
+    def snapshot(self):
+        return {stage: stats.snapshot() for stage, stats in self.stats.items()}
+
+
+def create_ocr_preprocessor():
+    """Preprocessor configured from OCR_MAX_SIDE and OCR_MIN_SIDE"""
+    return OCRPreprocessor(max_side=int(os.getenv('OCR_MAX_SIDE', '2000')),
+                           min_side=int(os.getenv('OCR_MIN_SIDE', '300')))
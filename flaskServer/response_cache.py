@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""TTL response cache for chatbot answers with pluggable backends"""
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Casefold, drop punctuation and collapse whitespace so trivial variants share a key"""
+    text = unicodedata.normalize('NFKC', prompt).casefold()
+    text = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in text)
+    return ' '.join(text.split())
+
+
+class InProcessBackend:
+    """Size-bounded LRU with per-entry expiry, local to one worker process"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Any redis-py compatible client, shared by every worker pointing at the same server"""
+
+    def __init__(self, client, prefix='chat:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl))
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of redis-py used by RedisBackend"""
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, name):
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[name]
+            return None
+        return value
+
+    def set(self, name, value, ex=None):
+        self._data[name] = (value.encode() if isinstance(value, str) else value,
+                            time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *names):
+        return sum(self._data.pop(name, None) is not None for name in names)
+
+
+class ResponseCache:
+    """Answers keyed on the normalized prompt and response language, with hit-rate counters"""
+
+    def __init__(self, backend, ttl=6 * 3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(prompt, response_language):
+        normalized = normalize_prompt(prompt)
+        return hashlib.sha1(f"{response_language}\x00{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, prompt, response_language):
+        try:
+            value = self.backend.get(self.key(prompt, response_language))
+        except Exception as e:
+            # A cache outage must never break chat
+            self.errors += 1
+            print(f"Response cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, prompt, response_language, response):
+        try:
+            self.backend.set(self.key(prompt, response_language), response, self.ttl)
+        except Exception as e:
+            self.errors += 1
+            print(f"Response cache write failed: {e}")
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def create_response_cache():
+    """Cache configured from CHAT_CACHE_BACKEND (memory/redis), CHAT_CACHE_TTL and friends"""
+    ttl = int(os.getenv('CHAT_CACHE_TTL', str(6 * 3600)))
+    if os.getenv('CHAT_CACHE_BACKEND', 'memory') == 'redis':
+        try:
+            import redis
+            client = redis.Redis.from_url(os.getenv('CHAT_CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+            return ResponseCache(RedisBackend(client), ttl)
+        except ImportError:
+            print("Warning: redis package not installed, using in-process chat cache")
+    return ResponseCache(InProcessBackend(int(os.getenv('CHAT_CACHE_MAX_ENTRIES', '1000'))), ttl)
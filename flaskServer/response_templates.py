@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Localized chat response text, compiled once per language and disease
+
+Prompts, disclaimers and appointment labels are plain module-level tables;
+TemplateRegistry turns them into ready-made prefix/suffix strings at import
+so a response is assembled with a single join. A new language only needs
+an entry in each table (or a register_language call).
+"""
+
+DEFAULT_LANGUAGE = 'en'
+
+# System line and formatting instructions sent to Gemini per response language
+LANGUAGE_PROMPTS = {
+    'hi': {
+        'system': 'आप एक पेशेवर मेडिकल AI सहायक हैं। कृपया हिंदी में एक अच्छी तरह से संरचित, पेशेवर उत्तर प्रदान करें।',
+        'instructions': '''कृपया अपना उत्तर इस तरह से प्रारूपित करें:
+- स्पष्ट चिकित्सा जानकारी
+- पेशेवर शब्दावली
+- सूची के लिए बुलेट पॉइंट्स
+- स्वास्थ्य पेशेवरों से परामर्श लेने की अस्वीकरण शामिल करें
+- उत्तर संक्षिप्त और जानकारीपूर्ण रखें
+- केवल हिंदी में उत्तर दें
+
+पेशेवर चिकित्सा परामर्श की आवश्यकता पर जोर देते हुए व्यावहारिक चिकित्सा मार्गदर्शन प्रदान करें।'''
+    },
+    'ta': {
+        'system': 'நீங்கள் ஒரு தொழில்முறை மருத்துவ AI உதவியாளர். தயவுசெய்து தமிழில் நல்ல முறையில் கட்டமைக்கப்பட்ட, தொழில்முறை பதிலை வழங்கவும்.',
+        'instructions': '''தயவுசெய்து உங்கள் பதிலை இப்படி வடிவமைக்கவும்:
+- தெளிவான மருத்துவ தகவல்கள்
+- தொழில்முறை சொற்கள்
+- பட்டியலுக்கு புள்ளிகள்
+- சுகாதார நிபுணர்களிடம் ஆலோசனை பெறுவது பற்றிய மறுப்பு அறிக்கை
+- பதிலை சுருக்கமாகவும் தகவல் நிறைந்ததாகவும் வைக்கவும்
+- தமிழில் மட்டுமே பதிலளிக்கவும்
+
+தொழில்முறை மருத்துவ ஆலோசனையின் தேவையை வலியுறுத்தும் போது நடைமுறை மருத்துவ வழிகாட்டுதலை வழங்கவும்.'''
+    },
+    'te': {
+        'system': 'మీరు ఒక వృత్తిపరమైన వైద్య AI సహాయకుడు. దయచేసి తెలుగులో బాగా నిర్మాణాత్మకమైన, వృత్తిపరమైన సమాధానం అందించండి.',
+        'instructions': '''దయచేసి మీ సమాధానాన్ని ఈ విధంగా ఫార్మాట్ చేయండి:
+- స్పష్టమైన వైద్య సమాచారం
+- వృత్తిపరమైన పరిభాష
+- జాబితాల కోసం బుల్లెట్ పాయింట్లు
+- ఆరోగ్య నిపుణులను సంప్రదించడం గురించి నిరాకరణ చేర్చండి
+- సమాధానాన్ని సంక్షిప్తంగా మరియు సమాచారంతో ఉంచండి
+- తెలుగులో మాత్రమే సమాధానం ఇవ్వండి
+
+వృత్తిపరమైన వైద్య సలహా అవసరాన్ని నొక్కిచెప్పేటప్పుడు ఆచరణాత్మక వైద్య మార్గదర్శకత్వం అందించండి.'''
+    },
+    'bn': {
+        'system': 'আপনি একজন পেশাদার চিকিৎসা AI সহায়ক। দয়া করে বাংলায় একটি সুগঠিত, পেশাদার উত্তর প্রদান করুন।',
+        'instructions': '''দয়া করে আপনার উত্তরটি এভাবে ফরম্যাট করুন:
+- স্পষ্ট চিকিৎসা তথ্য
+- পেশাদার পরিভাষা
+- তালিকার জন্য বুলেট পয়েন্ট
+- স্বাস্থ্য পেশাদারদের সাথে পরামর্শ নেওয়ার বিষয়ে দাবিত্যাগ অন্তর্ভুক্ত করুন
+- উত্তর সংক্ষিপ্ত এবং তথ্যপূর্ণ রাখুন
+- শুধুমাত্র বাংলায় উত্তর দিন
+
+পেশাদার চিকিৎসা পরামর্শের প্রয়োজনীয়তার উপর জোর দিয়ে ব্যবহারিক চিকিৎসা নির্দেশনা প্রদান করুন।'''
+    },
+    'en': {
+        'system': 'You are a professional medical AI assistant. Please provide a well-structured, professional response in English.',
+        'instructions': '''Please format your response with:
+- Clear medical information
+- Professional terminology
+- Bullet points for lists
+- Include disclaimer about consulting healthcare professionals
+- Keep response concise and informative
+- Respond ONLY in English
+
+Provide practical medical guidance while emphasizing the need for professional medical consultation.'''
+    }
+}
+
+# Disclaimer and appointment heading appended to every answer
+DISCLAIMERS = {
+    'hi': "\n**⚠️ चिकित्सा अस्वीकरण:**\nयह जानकारी केवल शैक्षिक उद्देश्यों के लिए है। उचित चिकित्सा निदान और उपचार के लिए कृपया किसी स्वास्थ्य पेशेवर से सलाह लें।\n\n",
+    'ta': "\n**⚠️ மருத்துவ மறுப்பு:**\nஇந்த தகவல் கல்வி நோக்கங்களுக்காக மட்டுமே. சரியான மருத்துவ கண்டறிதல் மற்றும் சிகிச்சைக்கு தயவுசெய்து ஒரு சுகாதார நிபுணரை ஆலோசிக்கவும்।\n\n",
+    'te': "\n**⚠️ వైద్య నిరాకరణ:**\nఈ సమాచారం కేవలం విద్యా ప్రయోజనాల కోసం మాత్రమే. సరైన వైద్య నిర్ధారణ మరియు చికిత్స కోసం దయచేసి ఆరోగ్య నిపుణుడిని సంప్రదించండి।\n\n",
+    'bn': "\n**⚠️ চিকিৎসা দাবিত্যাগ:**\nএই তথ্য শুধুমাত্র শিক্ষাগত উদ্দেশ্যে। যথাযথ চিকিৎসা নির্ণয় এবং চিকিৎসার জন্য দয়া করে একজন স্বাস্থ্য পেশাদারের সাথে পরামর্শ করুন।\n\n",
+    'en': "\n**⚠️ Medical Disclaimer:**\nThis information is for educational purposes only. Please consult with a healthcare professional for proper medical diagnosis and treatment.\n\n"
+}
+
+APPOINTMENT_LABELS = {
+    'hi': "**📅 अपॉइंटमेंट की जानकारी:**\n",
+    'ta': "**📅 நியமன தகவல்:**\n",
+    'te': "**📅 అపాయింట్మెంట్ సమాచారం:**\n",
+    'bn': "**📅 অ্যাপয়েন্টমেন্ট তথ্য:**\n",
+    'en': "**📅 Appointment Information:**\n"
+}
+
+
+class TemplateRegistry:
+    """Pre-rendered prompt, footer and disease guidance strings"""
+
+    def __init__(self, prompts=LANGUAGE_PROMPTS, disclaimers=DISCLAIMERS, appointment_labels=APPOINTMENT_LABELS):
+        self._prompts = {}
+        self._footers = {}
+        self._disclaimers = {}
+        self._guidance = {}
+        self._titles = {}
+        for language, config in prompts.items():
+            self.register_language(language, config['system'], config['instructions'],
+                                   disclaimers[language], appointment_labels[language])
+
+    def register_language(self, language, system, instructions, disclaimer, appointment_label):
+        # Enhanced prompt for better medical formatting with language support
+        self._prompts[language] = (f"{system}\n\nUser Question: ", f"\n\n{instructions}")
+        self._footers[language] = disclaimer + appointment_label
+        self._disclaimers[language] = disclaimer
+
+    def add_guidance(self, guidance):
+        """Store rendered guidance blocks, {disease: text}"""
+        for disease, text in guidance.items():
+            self._guidance[disease] = text
+            self._titles[disease] = f"**{disease.title()} Treatment Guidelines**"
+
+    def medical_prompt(self, prompt, language=DEFAULT_LANGUAGE):
+        prefix, suffix = self._prompts.get(language) or self._prompts[DEFAULT_LANGUAGE]
+        return "".join((prefix, prompt, suffix))
+
+    def footer(self, language, appointment_info=None):
+        """Disclaimer and appointment details, or only the disclaimer without appointment_info"""
+        if appointment_info is None:
+            return self._disclaimers.get(language) or self._disclaimers[DEFAULT_LANGUAGE]
+        return "".join((self._footers.get(language) or self._footers[DEFAULT_LANGUAGE], appointment_info))
+
+    def guidance(self, disease):
+        """Rendered guidance for a disease, or None if it was never added"""
+        return self._guidance.get(disease)
+
+    def title(self, disease):
+        return self._titles.get(disease) or f"**{disease.title()} Treatment Guidelines**"
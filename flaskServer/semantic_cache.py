@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Similarity-based cache that serves answers for paraphrased chatbot prompts"""
+import os
+import threading
+import time
+from itertools import count
+
+from scipy import sparse
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, HashingVectorizer
+
+from response_cache import normalize_prompt
+
+# Words that flip the meaning of a prompt ("headache with/without fever", "safe/not safe");
+# normalize_prompt splits "can't" into "can t"
+NEGATIONS = frozenset({
+    'no', 'not', 'never', 'without', 'nor', 'none', 'nothing', 'cannot', 't',
+    'nahi', 'nahin', 'mat', 'bina', 'नहीं', 'नही', 'मत', 'बिना', 'न',
+})
+POLARITY_WORDS = frozenset({
+    'with', 'before', 'after', 'above', 'below', 'more', 'less', 'over', 'under', 'against', 'up', 'down',
+})
+
+# Filler words ("what should I do for ...") otherwise dominate short prompts
+STOP_WORDS = (ENGLISH_STOP_WORDS - NEGATIONS - POLARITY_WORDS) | {
+    'kya', 'karu', 'karen', 'mujhe', 'hai', 'ka', 'ki', 'ke', 'mein',
+    'क्या', 'करें', 'करूं', 'मुझे', 'है', 'का', 'की', 'के', 'में', 'लिए',
+}
+
+
+def negations(prompt):
+    """Negation words of a prompt; a cached answer is only reused for the same set"""
+    return frozenset(word for word in normalize_prompt(prompt).split() if word in NEGATIONS)
+
+
+class SemanticCache:
+    """Per-language store of prompt vectors and answers, searched by cosine similarity.
+
+    Prompts are embedded with a stateless character n-gram vectorizer (the
+    same kind of sparse TF vectors as the medicine module), so any script
+    works and nothing has to be fitted up front. Character n-grams barely
+    see a "not" or "without", so entries whose negation words differ from
+    the prompt's are never a match, however similar.
+    """
+
+    def __init__(self, threshold=0.85, max_entries=2000, ttl=6 * 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.vectorizer = HashingVectorizer(analyzer='char_wb', ngram_range=(2, 4), n_features=2 ** 18,
+                                            alternate_sign=False, norm='l2')
+        self._stores = {}
+        self._lock = threading.Lock()
+        self._ids = count(1)
+        self.hits = 0
+        self.misses = 0
+        self.false_hits = 0
+
+    def _embed(self, prompt):
+        words = [word for word in normalize_prompt(prompt).split() if word not in STOP_WORDS]
+        return self.vectorizer.transform([' '.join(words)])
+
+    def _store(self, language):
+        return self._stores.setdefault(language, {"entries": [], "vectors": [], "matrix": None})
+
+    def _nearest(self, prompt, language):
+        """(entry, similarity) of the closest live entry, or (None, 0)"""
+        vector = self._embed(prompt)
+        negated = negations(prompt)
+        with self._lock:
+            store = self._stores.get(language)
+            if not store or not store["entries"]:
+                return None, 0.0
+            if store["matrix"] is None:
+                store["matrix"] = sparse.vstack(store["vectors"]).tocsr()
+            similarities = (store["matrix"] @ vector.T).toarray().ravel()
+            now = time.monotonic()
+            for i, entry in enumerate(store["entries"]):
+                # Expired entries must not win over a live copy of the same prompt
+                if entry["expires_at"] < now:
+                    similarities[i] = -1.0
+                elif entry["negations"] != negated:
+                    similarities[i] = 0.0
+            best = int(similarities.argmax())
+            if similarities[best] < 0:
+                return None, 0.0
+            return store["entries"][best], float(similarities[best])
+
+    def get(self, prompt, language):
+        """Cached answer for a prompt similar enough to one answered before, or None"""
+        entry, similarity = self._nearest(prompt, language)
+        if entry is not None and similarity >= self.threshold:
+            self.hits += 1
+            return entry["answer"]
+        self.misses += 1
+        return None
+
+    def set(self, prompt, language, answer):
+        vector = self._embed(prompt)
+        normalized = normalize_prompt(prompt)
+        with self._lock:
+            store = self._store(language)
+            # Expired entries and an older answer to the same prompt are replaced, not kept alongside
+            now = time.monotonic()
+            keep = [i for i, entry in enumerate(store["entries"])
+                    if entry["expires_at"] >= now and entry["key"] != normalized]
+            if len(keep) < len(store["entries"]):
+                store["entries"] = [store["entries"][i] for i in keep]
+                store["vectors"] = [store["vectors"][i] for i in keep]
+            store["entries"].append({"id": next(self._ids), "prompt": prompt, "key": normalized, "answer": answer,
+                                     "negations": negations(prompt),
+                                     "expires_at": time.monotonic() + self.ttl})
+            store["vectors"].append(vector)
+            # Oldest entries go first once the language store is full
+            if len(store["entries"]) > self.max_entries:
+                del store["entries"][0], store["vectors"][0]
+            store["matrix"] = None
+
+    def report_false_hit(self, prompt, language):
+        """Count a wrong answer served for this prompt and drop the entry that produced it"""
+        entry, similarity = self._nearest(prompt, language)
+        if entry is None or similarity < self.threshold:
+            return False
+        with self._lock:
+            self.false_hits += 1
+            store = self._stores[language]
+            position = next((i for i, e in enumerate(store["entries"]) if e["id"] == entry["id"]), None)
+            if position is not None:
+                del store["entries"][position], store["vectors"][position]
+                store["matrix"] = None
+        return True
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            "threshold": self.threshold,
+            "entries": sum(len(store["entries"]) for store in self._stores.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "false_hits": self.false_hits,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def create_semantic_cache():
+    """Cache configured from CHAT_SEMANTIC_THRESHOLD and CHAT_SEMANTIC_MAX_ENTRIES"""
+    return SemanticCache(
+        threshold=float(os.getenv('CHAT_SEMANTIC_THRESHOLD', '0.85')),
+        max_entries=int(os.getenv('CHAT_SEMANTIC_MAX_ENTRIES', '2000')),
+        ttl=int(os.getenv('CHAT_CACHE_TTL', str(6 * 3600))),
+    )
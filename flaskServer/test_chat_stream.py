@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for /api/chat/stream against a local Gemini SSE stand-in (run with pytest)
+"""
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import app
+from benchmark import GeminiSSEStandIn, start_stand_in
+from gemini_client import GeminiClient
+from response_cache import InProcessBackend, ResponseCache
+from semantic_cache import SemanticCache
+
+
+class GeminiErrorStandIn(BaseHTTPRequestHandler):
+    """Answers every call with a 400, like Gemini rejecting a request"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"error": {"code": 400, "message": "API key not valid"}}'
+        self.send_response(400)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def stream_events(client, prompt):
+    """(seconds since the request, event) of every SSE event of /api/chat/stream"""
+    started = time.perf_counter()
+    response = client.post('/api/chat/stream', json={"input": prompt}, buffered=False)
+    events = []
+    for data in response.response:
+        for line in data.decode().splitlines():
+            if line.startswith("data: "):
+                events.append((time.perf_counter() - started, json.loads(line[6:])))
+    return events
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    """Test client of the Flask app with empty chat caches and a Gemini SSE stand-in"""
+    monkeypatch.setattr(GeminiSSEStandIn, "chunks", 5)
+    monkeypatch.setattr(GeminiSSEStandIn, "interval", 0.1)
+    server, base_url = start_stand_in(GeminiSSEStandIn)
+    monkeypatch.setattr(app, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(app, "gemini_client", GeminiClient("test-key", base_url=base_url, max_retries=0))
+    monkeypatch.setattr(app, "chat_cache", ResponseCache(InProcessBackend()))
+    monkeypatch.setattr(app, "semantic_cache", SemanticCache())
+    monkeypatch.setattr(app, "_initialized", True)  # medicine data isn't needed here
+    yield app.app.test_client()
+    server.shutdown()
+
+
+def test_chunks_are_forwarded_as_they_arrive(chat):
+    events = stream_events(chat, "I have fever")
+    chunks = [(at, event["chunk"]) for at, event in events if "chunk" in event]
+
+    assert [text for _, text in chunks[:5]] == ["For fever, rest well. "] + [f"Sentence {i}. " for i in range(1, 5)]
+    # The first chunk is sent while Gemini is still producing the rest
+    assert chunks[0][0] < events[-1][0] - 0.25
+
+
+def test_guidance_footer_and_done_follow_the_answer(chat):
+    events = [event for _, event in stream_events(chat, "I have fever")]
+
+    guidance, footer, done = events[-3:]
+    assert guidance["chunk"].startswith("\n\n" + app.treatment_guidelines(["fever"])[0])
+    assert app.cached_guidance("fever") in guidance["chunk"]
+    assert footer["chunk"].startswith(app.response_templates.footer("en", ""))
+    assert done == {"done": True}
+
+
+def test_streamed_answer_is_cached(chat):
+    stream_events(chat, "I have fever")
+    events = [event for _, event in stream_events(chat, "i have FEVER!")]
+
+    assert app.chat_cache.hits == 1
+    assert events[0]["chunk"].startswith("For fever, rest well. Sentence 1.")
+    assert events[-1] == {"done": True}
+
+
+@pytest.mark.parametrize("chunks, finish_reason", [
+    (0, "SAFETY"),  # blocked before any text
+    (0, "STOP"),    # empty answer
+    (2, "SAFETY"),  # blocked part way through
+    (2, None),      # stream broke off
+])
+def test_incomplete_answers_are_not_cached(chat, monkeypatch, chunks, finish_reason):
+    monkeypatch.setattr(GeminiSSEStandIn, "chunks", chunks)
+    monkeypatch.setattr(GeminiSSEStandIn, "finish_reason", finish_reason)
+
+    events = [event for _, event in stream_events(chat, "I have fever")]
+
+    assert events[-1] == {"done": True}
+    if not chunks:
+        assert events[0]["chunk"] == "I'm sorry, but I couldn't process your request. Please try again."
+    assert app.chat_cache.get("I have fever", "en") is None
+    assert app.semantic_cache.get("I have fever", "en") is None
+
+
+def test_upstream_error_is_sent_as_error_event(chat, monkeypatch):
+    server, base_url = start_stand_in(GeminiErrorStandIn)
+    monkeypatch.setattr(app, "gemini_client", GeminiClient("test-key", base_url=base_url, max_retries=0))
+
+    events = [event for _, event in stream_events(chat, "I have fever")]
+    server.shutdown()
+
+    assert len(events) == 1
+    assert events[0]["error"].startswith("Chat service error: Error: 400")
+    assert app.chat_cache.get("I have fever", "en") is None
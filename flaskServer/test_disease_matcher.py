@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for disease detection in chatbot answers (run with pytest)
+"""
+import pytest
+
+from disease_matcher import build_disease_matcher
+
+DISEASE_KEYS = ["fever", "common cold", "diabetes", "tuberculosis", "paralysis (brain hemorrhage)", "aids",
+                "heart attack"]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return build_disease_matcher(DISEASE_KEYS)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("I have a cold", ["common cold"]),
+    ("She caught a cold last week", ["common cold"]),
+    ("Cold and cough usually pass in a week", ["common cold"]),
+    ("Common cold and flu spread in winter", ["common cold"]),
+    ("For fever, rest and drink fluids", ["fever"]),
+    ("Fever while having a cold: rest well", ["fever", "common cold"]),
+    ("बुखार और जुकाम में आराम करें", ["fever", "common cold"]),
+    ("A brain stroke needs urgent care", ["paralysis (brain hemorrhage)"]),
+    ("diabetes food chart", ["diabetes"]),
+])
+def test_detects_mentions(matcher, text, expected):
+    assert matcher.find_all(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Avoid heat stroke by staying in the shade",
+    "Take 1 tb of honey with warm water",
+    "HIV testing is free at government hospitals",
+    "Avoid cold drinks and ice cream",
+    "Don't take a cold shower",
+    "Stop scolding yourself",
+    "Stay in a cold room",
+    "Cold sweats can be a warning sign",
+    "Use cold packs on the swelling",
+    "Cold-pressed juice is fine",
+    "Feeling cold and shivering",
+    "Do not catch cold",
+])
+def test_ignores_look_alikes(matcher, text):
+    assert matcher.find_all(text) == []
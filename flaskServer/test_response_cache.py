@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the chatbot response cache on both backends (run with pytest)
+"""
+import pytest
+
+import response_cache
+from response_cache import FakeRedis, InProcessBackend, RedisBackend, ResponseCache
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    backend = InProcessBackend() if request.param == "memory" else RedisBackend(FakeRedis())
+    return ResponseCache(backend, ttl=60)
+
+
+def test_trivial_variants_share_an_answer(cache):
+    cache.set("What should I do for fever?", "en", "Rest and drink fluids.")
+
+    assert cache.get("what should i do for FEVER", "en") == "Rest and drink fluids."
+    assert cache.get("  What should I do   for fever!! ", "en") == "Rest and drink fluids."
+    assert cache.snapshot()["hits"] == 2
+
+
+def test_answers_are_kept_per_response_language(cache):
+    cache.set("fever", "en", "Rest.")
+
+    assert cache.get("fever", "hi") is None
+    assert cache.snapshot()["misses"] == 1
+
+
+def test_entries_expire(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache.set("fever", "en", "Rest.")
+
+    now[0] += 59
+    assert cache.get("fever", "en") == "Rest."
+    now[0] += 2
+    assert cache.get("fever", "en") is None
+
+
+def test_redis_backend_shares_entries_between_workers():
+    server = FakeRedis()
+    first, second = ResponseCache(RedisBackend(server)), ResponseCache(RedisBackend(server))
+    first.set("diabetes diet", "en", "Whole grains, vegetables, no sugary drinks.")
+
+    assert second.get("Diabetes diet?", "en") == "Whole grains, vegetables, no sugary drinks."
+
+
+def test_backend_outage_is_a_miss():
+    class DownRedis(FakeRedis):
+        def get(self, name):
+            raise ConnectionError("Connection refused")
+
+        def set(self, name, value, ex=None):
+            raise ConnectionError("Connection refused")
+
+    cache = ResponseCache(RedisBackend(DownRedis()))
+    cache.set("fever", "en", "Rest.")
+
+    assert cache.get("fever", "en") is None
+    assert cache.snapshot()["errors"] == 2
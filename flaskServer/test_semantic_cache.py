@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the semantic chat cache (run with pytest)
+"""
+import pytest
+
+import semantic_cache
+from semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_paraphrase_hits(clock):
+    cache = SemanticCache(ttl=60)
+    cache.set("fever what to do", "en", "Rest.")
+
+    assert cache.get("what should I do for fever?", "en") == "Rest."
+
+
+def test_restored_prompt_hits_after_expiry(clock):
+    cache = SemanticCache(ttl=60)
+    cache.set("fever what to do", "en", "Rest.")
+    clock[0] += 61
+    assert cache.get("fever what to do", "en") is None
+
+    cache.set("fever what to do", "en", "Rest and drink fluids.")
+
+    assert cache.get("fever what to do", "en") == "Rest and drink fluids."
+    assert cache.snapshot()["entries"] == 1
+
+
+def test_same_prompt_replaces_its_entry(clock):
+    cache = SemanticCache()
+    cache.set("I have fever", "en", "Rest.")
+    cache.set("i have FEVER!", "en", "Rest and drink fluids.")
+
+    assert cache.get("I have fever", "en") == "Rest and drink fluids."
+    assert cache.snapshot()["entries"] == 1
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("headache with fever", "headache without fever"),
+    ("is it safe to drink alcohol with diabetes", "is it not safe to drink alcohol with diabetes"),
+])
+def test_negated_question_misses(clock, cached, asked):
+    cache = SemanticCache()
+    cache.set(cached, "en", "answer")
+
+    assert cache.get(asked, "en") is None
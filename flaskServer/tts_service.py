@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""Text-to-speech rendered to WAV files in a worker process pool
+
+pyttsx3 engines are neither thread-safe nor cheap to start, so each pool
+process owns one engine and requests only wait for a job handle. Finished
+audio is cached on disk under a hash of the language and text.
+
+Job state lives next to the audio in the cache directory (a .pending
+marker while rendering, a .failed file with the error), so any gunicorn
+worker sharing the directory can answer for a job another one started.
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.cache', 'tts'))
+
+# One engine per pool process, created on its first job
+_engine = None
+
+
+def _pick_voice(engine, language):
+    """Id of an installed voice for the language code, or None to keep the default"""
+    for voice in engine.getProperty('voices'):
+        languages = [lang.decode(errors='ignore') if isinstance(lang, bytes) else str(lang)
+                     for lang in (voice.languages or [])]
+        if any(language in lang.lower() for lang in languages) or f"/{language}" in voice.id.lower():
+            return voice.id
+    return None
+
+
+def render_wav(text, language, path):
+    """Synthesize text into a WAV file at path (runs inside a pool process)"""
+    global _engine
+    import pyttsx3
+
+    if _engine is None:
+        _engine = pyttsx3.init()
+    voice = _pick_voice(_engine, language)
+    if voice:
+        _engine.setProperty('voice', voice)
+
+    tmp_path = f"{path}.tmp-{os.getpid()}.wav"
+    _engine.save_to_file(text, tmp_path)
+    _engine.runAndWait()
+    # Readers only ever see complete files
+    os.replace(tmp_path, path)
+    return path
+
+
+class TTSService:
+    """Queues synthesis jobs and serves their audio by id (a hash of language and text).
+
+    A .pending marker older than pending_timeout seconds belongs to a job
+    whose worker died; the job counts as failed and the next submit renders
+    it again.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, workers=2, max_files=500, render=render_wav, pending_timeout=120):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.max_files = max_files
+        self.render = render
+        self.pending_timeout = pending_timeout
+        self._pool = None
+        self._jobs = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.rendered = 0
+
+    @staticmethod
+    def key(text, language):
+        return hashlib.sha256(f"{language}\x00{text}".encode('utf-8')).hexdigest()[:32]
+
+    @staticmethod
+    def valid_id(audio_id):
+        return len(audio_id) == 32 and all(ch in '0123456789abcdef' for ch in audio_id)
+
+    def path(self, audio_id):
+        return os.path.join(self.cache_dir, f"{audio_id}.wav")
+
+    def _marker(self, audio_id, kind):
+        return os.path.join(self.cache_dir, f"{audio_id}.{kind}")
+
+    def _pending_elsewhere(self, audio_id):
+        """Whether a live job for the id was started (possibly by another worker process)"""
+        try:
+            return time.time() - os.path.getmtime(self._marker(audio_id, 'pending')) < self.pending_timeout
+        except OSError:
+            return False
+
+    def _submit_to_pool(self, text, language, audio_id):
+        if self._pool is None:
+            # Created lazily so gunicorn forks workers before any pool processes exist
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            return self._pool.submit(self.render, text, language, self.path(audio_id))
+        except (BrokenProcessPool, RuntimeError):
+            # A pool process died (e.g. the speech engine crashed); start a fresh pool once
+            self._reset_pool()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool.submit(self.render, text, language, self.path(audio_id))
+
+    def _reset_pool(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, text, language='en'):
+        """Start rendering (unless cached or already queued) and return the audio id"""
+        audio_id = self.key(text, language)
+        if os.path.exists(self.path(audio_id)):
+            self.hits += 1
+            return audio_id
+
+        with self._lock:
+            if audio_id in self._jobs or self._pending_elsewhere(audio_id):
+                return audio_id
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._errors.pop(audio_id, None)
+            self._remove(self._marker(audio_id, 'failed'))
+            with open(self._marker(audio_id, 'pending'), 'w') as f:
+                f.write(str(os.getpid()))
+            try:
+                future = self._submit_to_pool(text, language, audio_id)
+            except Exception:
+                self._remove(self._marker(audio_id, 'pending'))
+                raise
+            self._jobs[audio_id] = future
+        future.add_done_callback(lambda f: self._finished(audio_id, f))
+        return audio_id
+
+    def _finished(self, audio_id, future):
+        with self._lock:
+            self._jobs.pop(audio_id, None)
+            failure = None if future.cancelled() else future.exception()
+            if future.cancelled() or failure is not None:
+                error = str(failure) if failure is not None else "rendering was cancelled"
+                self._errors[audio_id] = error
+                print(f"Text-to-speech failed: {error}")
+                if isinstance(failure, BrokenProcessPool):
+                    self._reset_pool()
+                try:
+                    with open(self._marker(audio_id, 'failed'), 'w', encoding='utf-8') as f:
+                        f.write(error)
+                except OSError:
+                    pass
+                self._remove(self._marker(audio_id, 'pending'))
+                return
+            self._remove(self._marker(audio_id, 'pending'))
+            self.rendered += 1
+        self._prune()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _prune(self):
+        # Oldest audio (and failure notes) go first once the cache directory is full
+        files = [entry for entry in os.scandir(self.cache_dir)
+                 if entry.name.endswith(('.wav', '.failed')) and '.tmp-' not in entry.name]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.max_files]:
+            self._remove(entry.path)
+
+    def status(self, audio_id, wait=0.0):
+        """'ready', 'pending', 'failed' or 'unknown', optionally waiting up to `wait` seconds"""
+        if os.path.exists(self.path(audio_id)):
+            return "ready"
+        with self._lock:
+            future = self._jobs.get(audio_id)
+        if future is not None:
+            try:
+                failure = future.exception(timeout=wait)
+            except FutureTimeout:
+                return "pending"
+            except Exception:  # cancelled
+                return "failed"
+            return "failed" if failure is not None else "ready"
+
+        # Started by another worker process: follow its files
+        deadline = time.monotonic() + wait
+        while True:
+            if os.path.exists(self.path(audio_id)):
+                return "ready"
+            if audio_id in self._errors or os.path.exists(self._marker(audio_id, 'failed')):
+                return "failed"
+            if not os.path.exists(self._marker(audio_id, 'pending')):
+                return "unknown"
+            if not self._pending_elsewhere(audio_id):
+                return "failed"
+            if time.monotonic() >= deadline:
+                return "pending"
+            time.sleep(0.1)
+
+    def error(self, audio_id):
+        if audio_id in self._errors:
+            return self._errors[audio_id]
+        try:
+            with open(self._marker(audio_id, 'failed'), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return "rendering was interrupted" if os.path.exists(self._marker(audio_id, 'pending')) else None
+
+    def snapshot(self):
+        return {
+            "workers": self.workers,
+            "pending": len(self._jobs),
+            "cache_hits": self.hits,
+            "rendered": self.rendered,
+            "failed": len(self._errors),
+        }
+
+
+def create_tts_service():
+    """Service configured from TTS_WORKERS and TTS_CACHE_MAX_FILES"""
+    return TTSService(workers=int(os.getenv('TTS_WORKERS', '2')),
+                      max_files=int(os.getenv('TTS_CACHE_MAX_FILES', '500')))